@@ -22,6 +22,8 @@ from typing import Dict, List, Optional, Tuple
 import re
 import pandas as pd
 
+from file_scanner import scan_files
+
 class BactopiaGUI:
     def __init__(self, root):
         self.root = root
@@ -307,16 +309,11 @@ class BactopiaGUI:
     def detect_paired_files(self, fastq_dir: Path) -> List[Dict]:
         """Detecta arquivos FASTQ paired-end e single-end."""
         samples = []
-        fastq_files = []
-        
-        # Padrões para busca
-        patterns = ["*.fastq.gz", "*.fq.gz", "*.fastq", "*.fq"]
         
-        for pattern in patterns:
-            if self.recursive_search.get():
-                fastq_files.extend(fastq_dir.rglob(pattern))
-            else:
-                fastq_files.extend(fastq_dir.glob(pattern))
+        # Extensões aceitas, todas numa única varredura da pasta
+        extensions = [".fastq.gz", ".fq.gz", ".fastq", ".fq"]
+        fastq_files = [scanned.path for scanned in
+                       scan_files(fastq_dir, extensions, self.recursive_search.get())]
         
         # Agrupar por nome base (sem _R1/_R2, _1/_2, etc.)
         paired_files = {}
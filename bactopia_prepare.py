@@ -17,6 +17,8 @@ import re
 import logging
 from datetime import datetime
 
+from file_scanner import scan_files
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -44,11 +46,9 @@ class BactopiaPrepare
         Returns
             List of sample dictionaries
         
-        fastq_files = []
-        
-        # Find all FASTQ files
-        for pattern in ['.fastq', '.fastq.gz', '.fq', '.fq.gz']
-            fastq_files.extend(self.fastq_dir.glob(pattern))
+        # Find all FASTQ files in a single pass over the directory
+        extensions = ['.fastq', '.fastq.gz', '.fq', '.fq.gz']
+        fastq_files = [scanned.path for scanned in scan_files(self.fastq_dir, extensions)]
         
         # Group paired-end files
         paired_files = {}
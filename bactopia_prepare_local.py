@@ -6,6 +6,9 @@ import os
 import csv
 import re
 import subprocess
+from pathlib import Path
+
+from file_scanner import scan_files
 
 DEFAULT_DIR = "/home/labalerta/Felipe/SRA_CNPQ"
 
@@ -69,14 +72,7 @@ class LocalPrepareGUI:
             return
 
         # Buscar arquivos
-        fastq_files = []
-        if recursive:
-            for root, _, files in os.walk(fastq_dir):
-                for file in files:
-                    if file.endswith(".fastq.gz"):
-                        fastq_files.append(os.path.join(root, file))
-        else:
-            fastq_files = [os.path.join(fastq_dir, f) for f in os.listdir(fastq_dir) if f.endswith(".fastq.gz")]
+        fastq_files = [str(scanned.path) for scanned in scan_files(Path(fastq_dir), [".fastq.gz"], recursive)]
 
         if not fastq_files:
             messagebox.showerror("Erro", "Nenhum arquivo FASTQ encontrado.")
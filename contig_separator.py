@@ -7,7 +7,8 @@ Autor: Felipe Lei
 Versão: 2.0
 Data: 2025-06-22
 
-Dependências: biopython
+Dependências: biopython (apenas para saída GenBank)
+Opcional: xxhash (hash mais rápido para --dedup)
 Instalação: pip install biopython
 """
 
@@ -16,11 +17,51 @@ import sys
 import argparse
 import logging
 import re
+import io
+import time
+import functools
+import glob
+import hashlib
+import heapq
+import json
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from bisect import bisect_right
 from pathlib import Path
-from collections import defaultdict, Counter
-from typing import Dict, List, Optional, Pattern
-from Bio import SeqIO
-from Bio.SeqRecord import SeqRecord
+from collections import Counter, OrderedDict
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+
+from fasta_io import (
+    COMPRESSION_CHOICES, READ_CHUNK_SIZE, FastaRecord, append_file, compressed_name, detect_compression,
+    iter_fasta_records, make_fasta_record, open_input, open_output, sequence_digest_function,
+    write_fasta_record
+)
+
+# Limites do pool de escrita por isolado
+DEFAULT_MAX_OPEN_FILES = 256
+WRITE_BUFFER_SIZE = 128 * 1024
+
+# Cache do extrator de IDs: tamanho, e consultas/taxa de acerto mínima
+# avaliadas antes de desligá-lo
+ID_CACHE_SIZE = 65536
+ID_CACHE_WARMUP = 10000
+ID_CACHE_MIN_HIT_RATE = 0.1
+
+# Modo multiprocesso: janela usada para alinhar os cortes
+RANGE_SCAN_SIZE = 64 * 1024
+
+# Limites inferiores das faixas do histograma de tamanhos (bp)
+LENGTH_BINS = (0, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+LENGTH_BIN_LABELS = [f"{low}-{high - 1}" for low, high in zip(LENGTH_BINS, LENGTH_BINS[1:])] + [f"{LENGTH_BINS[-1]}+"]
+
+# Modos de tratamento de contigs duplicados (--dedup)
+DEDUP_CHOICES = ["drop", "report"]
+
+# Índice persistente (estilo .fai) gravado ao lado do FASTA de entrada
+INDEX_SUFFIX = ".isolates.fai"
+INDEX_VERSION = "2"
 
 def setup_logging(verbose: bool = False) -> None:
     """Configura o sistema de logging."""
@@ -42,6 +83,33 @@ def validate_input_file(file_path: str) -> Path:
         raise ValueError(f"Arquivo está vazio: {file_path}")
     return path
 
+def expand_input_paths(patterns: List[str]) -> List[Path]:
+    """
+    Expande padrões glob e valida os arquivos de entrada.
+    
+    A ordem dos argumentos é mantida (cada padrão é expandido em ordem
+    alfabética) e arquivos repetidos são considerados uma única vez.
+    """
+    paths: List[Path] = []
+    seen = set()
+    
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"Nenhum arquivo corresponde ao padrão: {pattern}")
+        else:
+            matches = [pattern]
+        
+        for match in matches:
+            path = validate_input_file(match)
+            key = path.resolve()
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    
+    return paths
+
 def get_regex_patterns() -> Dict[str, Pattern]:
     """Define padrões regex para diferentes tipos de identificadores."""
     patterns = {
@@ -53,65 +121,246 @@ def get_regex_patterns() -> Dict[str, Pattern]:
     }
     return patterns
 
-def extract_isolate_id(description: str, patterns: Dict[str, Pattern], custom_pattern: Optional[str] = None) -> Optional[str]:
+class IsolateIdExtractor:
     """
-    Extrai o ID do isolado da descrição do contig.
-    
-    Args:
-        description: Descrição do contig
-        patterns: Dicionário com padrões regex
-        custom_pattern: Padrão customizado opcional
+    Extrai IDs de isolado dos cabeçalhos, compilado uma única vez por execução.
     
-    Returns:
-        ID do isolado ou None se não encontrado
+    O padrão customizado é compilado uma vez e testado antes dos predefinidos,
+    na ordem de get_regex_patterns ("primeiro padrão que encontrar vence").
+    Os resultados ficam em cache LRU por cabeçalho; se, após as primeiras
+    consultas, quase nenhum cabeçalho se repetir, o cache é desligado para
+    não pesar sobre arquivos com cabeçalhos únicos.
     """
-    # Tentar padrão customizado primeiro
-    if custom_pattern:
-        try:
-            custom_regex = re.compile(custom_pattern)
-            match = custom_regex.search(description)
+    
+    def __init__(
+        self,
+        patterns: Dict[str, Pattern],
+        custom_pattern: Optional[str] = None,
+        cache_size: int = ID_CACHE_SIZE
+    ):
+        """
+        Args:
+            patterns: Dicionário com padrões regex predefinidos
+            custom_pattern: Padrão customizado opcional (tem prioridade)
+            cache_size: Número de cabeçalhos mantidos no cache (0 desativa)
+        """
+        compiled = []
+        if custom_pattern:
+            try:
+                compiled.append(re.compile(custom_pattern))
+            except re.error as e:
+                logging.warning(f"Padrão regex inválido '{custom_pattern}': {e}")
+        compiled.extend(patterns.values())
+        
+        # (método search, grupo devolvido): o primeiro grupo do padrão, ou o
+        # padrão inteiro quando ele não tem grupos
+        self._searchers = [(pattern.search, 1 if pattern.groups else 0) for pattern in compiled]
+        self._misses = 0
+        
+        if cache_size > 0:
+            self.extract = functools.lru_cache(maxsize=cache_size)(self._extract_miss)
+        else:
+            self.extract = self._search
+    
+    def _search(self, description: str) -> Optional[str]:
+        for search, group in self._searchers:
+            match = search(description)
             if match:
-                return match.group(1) if match.groups() else match.group(0)
-        except re.error as e:
-            logging.warning(f"Padrão regex inválido '{custom_pattern}': {e}")
+                return match.group(group)
+        return None
+    
+    def _extract_miss(self, description: str) -> Optional[str]:
+        self._misses += 1
+        if self._misses == ID_CACHE_WARMUP:
+            hits = self.extract.cache_info().hits
+            if hits < ID_CACHE_WARMUP * ID_CACHE_MIN_HIT_RATE:
+                logging.debug(f"Cache de IDs desativado ({hits} acertos em "
+                              f"{hits + self._misses} consultas)")
+                self.extract = self._search
+        return self._search(description)
+
+def format_genbank_record(record: FastaRecord) -> bytes:
+    """Converte um registro para GenBank (importa Biopython sob demanda)."""
+    from Bio import SeqIO
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
     
-    # Tentar padrões predefinidos
-    for pattern_name, pattern in patterns.items():
-        match = pattern.search(description)
-        if match:
-            logging.debug(f"Padrão '{pattern_name}' encontrou: {match.group(1)}")
-            return match.group(1)
+    seq_record = SeqRecord(
+        Seq(record.sequence().decode("ascii")),
+        id=record.id,
+        name=record.id,
+        description=record.description
+    )
+    seq_record.annotations["molecule_type"] = "DNA"
     
-    return None
+    text = io.StringIO()
+    SeqIO.write(seq_record, text, "genbank")
+    return text.getvalue().encode("utf-8")
 
-def analyze_fasta_file(fasta_path: Path, patterns: Dict[str, Pattern], custom_pattern: Optional[str] = None) -> Dict:
+class AssemblyStats:
     """
-    Analisa o arquivo FASTA e retorna estatísticas.
+    Acumulador de estatísticas de montagem com memória limitada.
     
-    Returns:
-        Dicionário com estatísticas do arquivo
+    Guarda contadores e um histograma de tamanhos; os tamanhos individuais
+    (necessários para N50/L50) ficam em um array de inteiros de 8 bytes,
+    em vez de uma lista de objetos Python.
     """
-    stats = {
+    
+    def __init__(self, keep_lengths: bool = True):
+        self.count = 0
+        self.total_length = 0
+        self.min_length: Optional[int] = None
+        self.max_length = 0
+        self.gc_count = 0
+        self.n_count = 0
+        self.composition_known = True
+        self.histogram = [0] * len(LENGTH_BINS)
+        self.lengths: Optional[array] = array("Q") if keep_lengths else None
+        self._sorted = True
+    
+    def add(self, length: int, gc: Optional[int] = None, n: Optional[int] = None) -> None:
+        """Acumula um contig (gc/n são contagens de bases, se calculadas)."""
+        self.count += 1
+        self.total_length += length
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        if length > self.max_length:
+            self.max_length = length
+        if gc is None:
+            self.composition_known = False
+        else:
+            self.gc_count += gc
+            self.n_count += n or 0
+        self.histogram[bisect_right(LENGTH_BINS, length) - 1] += 1
+        if self.lengths is not None:
+            self.lengths.append(length)
+            self._sorted = False
+    
+    def merge(self, other: "AssemblyStats") -> None:
+        """Soma outro acumulador a este."""
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total_length += other.total_length
+        if self.min_length is None or other.min_length < self.min_length:
+            self.min_length = other.min_length
+        self.max_length = max(self.max_length, other.max_length)
+        self.gc_count += other.gc_count
+        self.n_count += other.n_count
+        self.composition_known = self.composition_known and other.composition_known
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        if self.lengths is not None and other.lengths is not None:
+            self.lengths.extend(other.lengths)
+            self._sorted = False
+    
+    def sorted_lengths(self) -> array:
+        """Tamanhos em ordem decrescente (ordenados uma única vez)."""
+        if not self._sorted:
+            self.lengths = array("Q", sorted(self.lengths, reverse=True))
+            self._sorted = True
+        return self.lengths
+    
+    def n50_l50(self) -> Tuple[int, int]:
+        """Calcula N50 e L50."""
+        return n50_l50(self.sorted_lengths(), self.total_length)
+    
+    def to_dict(self, n50: Optional[Tuple[int, int]] = None) -> Dict:
+        """Resumo serializável (JSON/TSV)."""
+        n50_value, l50_value = n50 if n50 is not None else self.n50_l50()
+        acgt = self.total_length - self.n_count
+        known = self.composition_known and self.count > 0
+        return {
+            'contigs': self.count,
+            'total_length': self.total_length,
+            'min_length': self.min_length or 0,
+            'max_length': self.max_length,
+            'mean_length': round(self.total_length / self.count, 1) if self.count else 0,
+            'n50': n50_value,
+            'l50': l50_value,
+            'gc_percent': round(100 * self.gc_count / acgt, 2) if known and acgt else None,
+            'n_count': self.n_count if known else None,
+            'n_percent': round(100 * self.n_count / self.total_length, 3) if known and self.total_length else None,
+            'length_histogram': dict(zip(LENGTH_BIN_LABELS, self.histogram)),
+        }
+
+def n50_l50(lengths_desc, total_length: int) -> Tuple[int, int]:
+    """N50/L50 a partir de tamanhos em ordem decrescente (qualquer iterável)."""
+    accumulated = 0
+    for position, length in enumerate(lengths_desc, 1):
+        accumulated += length
+        if accumulated * 2 >= total_length:
+            return length, position
+    return 0, 0
+
+def new_analysis_stats() -> Dict:
+    """Cria o dicionário vazio de estatísticas de análise."""
+    return {
         'total_sequences': 0,
-        'identified_isolates': defaultdict(int),
         'unidentified_sequences': 0,
-        'sequence_lengths': [],
-        'isolate_counts': Counter()
+        'overall': AssemblyStats(keep_lengths=False),
+        'unidentified': AssemblyStats(),
+        'isolates': {},
     }
+
+def update_analysis_stats(
+    stats: Dict,
+    seq_length: int,
+    isolate_id: Optional[str],
+    description: str,
+    gc: Optional[int] = None,
+    n: Optional[int] = None
+) -> None:
+    """Acumula um contig nas estatísticas de análise."""
+    stats['total_sequences'] += 1
+    stats['overall'].add(seq_length, gc, n)
+    
+    if isolate_id:
+        group = stats['isolates'].get(isolate_id)
+        if group is None:
+            group = stats['isolates'][isolate_id] = AssemblyStats()
+        group.add(seq_length, gc, n)
+    else:
+        stats['unidentified_sequences'] += 1
+        stats['unidentified'].add(seq_length, gc, n)
+        logging.debug(f"Sequência não identificada: {description}")
+
+def merge_analysis_stats(total: Dict, part: Dict) -> None:
+    """Soma as estatísticas de análise de um trecho ao total."""
+    total['total_sequences'] += part['total_sequences']
+    total['unidentified_sequences'] += part['unidentified_sequences']
+    total['overall'].merge(part['overall'])
+    total['unidentified'].merge(part['unidentified'])
+    for isolate_id, group in part['isolates'].items():
+        if isolate_id in total['isolates']:
+            total['isolates'][isolate_id].merge(group)
+        else:
+            total['isolates'][isolate_id] = group
+
+def overall_n50_l50(stats: Dict) -> Tuple[int, int]:
+    """
+    N50/L50 global sem juntar todos os tamanhos em uma lista: os arrays já
+    ordenados de cada grupo são intercalados com heapq.merge.
+    """
+    groups = list(stats['isolates'].values()) + [stats['unidentified']]
+    merged = heapq.merge(*(group.sorted_lengths() for group in groups), reverse=True)
+    return n50_l50(merged, stats['overall'].total_length)
+
+def analyze_fasta_file(fasta_path: Path, extractor: IsolateIdExtractor) -> Dict:
+    """
+    Analisa o arquivo FASTA e retorna estatísticas (passagem apenas de análise).
+    
+    Returns:
+        Dicionário com estatísticas do arquivo
+    """
+    stats = new_analysis_stats()
     
     try:
-        for record in SeqIO.parse(fasta_path, "fasta"):
-            stats['total_sequences'] += 1
-            stats['sequence_lengths'].append(len(record.seq))
-            
-            isolate_id = extract_isolate_id(record.description, patterns, custom_pattern)
-            
-            if isolate_id:
-                stats['identified_isolates'][isolate_id] += 1
-                stats['isolate_counts'][isolate_id] += 1
-            else:
-                stats['unidentified_sequences'] += 1
-                logging.debug(f"Sequência não identificada: {record.description}")
+        with open_input(fasta_path) as handle:
+            for record in iter_fasta_records(handle):
+                description = record.description
+                isolate_id = extractor.extract(description)
+                gc, n = record.composition()
+                update_analysis_stats(stats, record.length, isolate_id, description, gc, n)
     
     except Exception as e:
         logging.error(f"Erro ao analisar arquivo FASTA: {e}")
@@ -119,43 +368,671 @@ def analyze_fasta_file(fasta_path: Path, patterns: Dict[str, Pattern], custom_pa
     
     return stats
 
+def _format_percent(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}%"
+
 def print_analysis_report(stats: Dict) -> None:
     """Imprime relatório de análise do arquivo."""
+    overall = stats['overall'].to_dict(overall_n50_l50(stats))
+    
     logging.info("=" * 60)
     logging.info("RELATÓRIO DE ANÁLISE")
     logging.info("=" * 60)
     logging.info(f"Total de sequências: {stats['total_sequences']}")
-    logging.info(f"Isolados identificados: {len(stats['identified_isolates'])}")
+    logging.info(f"Isolados identificados: {len(stats['isolates'])}")
     logging.info(f"Sequências não identificadas: {stats['unidentified_sequences']}")
     
-    if stats['sequence_lengths']:
-        avg_length = sum(stats['sequence_lengths']) / len(stats['sequence_lengths'])
-        logging.info(f"Tamanho médio das sequências: {avg_length:.0f} bp")
-        logging.info(f"Sequência mais longa: {max(stats['sequence_lengths'])} bp")
-        logging.info(f"Sequência mais curta: {min(stats['sequence_lengths'])} bp")
+    if overall['contigs']:
+        logging.info(f"Tamanho total: {overall['total_length']} bp")
+        logging.info(f"Tamanho médio das sequências: {overall['mean_length']:.0f} bp")
+        logging.info(f"Sequência mais longa: {overall['max_length']} bp")
+        logging.info(f"Sequência mais curta: {overall['min_length']} bp")
+        logging.info(f"N50: {overall['n50']} bp (L50: {overall['l50']})")
+        if overall['gc_percent'] is not None:
+            logging.info(f"GC: {overall['gc_percent']:.2f}%  N: {overall['n_percent']:.3f}%")
+        logging.info("Distribuição de tamanhos:")
+        for label, count in overall['length_histogram'].items():
+            logging.info(f"  {label:>12}: {count}")
     
-    if stats['isolate_counts']:
+    if stats['isolates']:
         logging.info("\nContigs por isolado:")
-        for isolate, count in sorted(stats['isolate_counts'].items()):
-            logging.info(f"  {isolate}: {count} contigs")
+        for isolate, group in sorted(stats['isolates'].items()):
+            summary = group.to_dict()
+            logging.info(f"  {isolate}: {summary['contigs']} contigs, {summary['total_length']} bp, "
+                         f"N50 {summary['n50']}, GC {_format_percent(summary['gc_percent'])}")
     
     logging.info("=" * 60)
 
+def write_stats_report(stats: Dict, output_file: Path) -> None:
+    """
+    Grava as estatísticas por isolado e globais em JSON ou TSV.
+    
+    O formato é escolhido pela extensão (.json; qualquer outra gera TSV).
+    """
+    rows = [("ALL", stats['overall'].to_dict(overall_n50_l50(stats)))]
+    rows.extend((isolate, group.to_dict()) for isolate, group in sorted(stats['isolates'].items()))
+    if stats['unidentified'].count:
+        rows.append(("UNIDENTIFIED", stats['unidentified'].to_dict()))
+    
+    with open(output_file, "w") as out:
+        if output_file.suffix.lower() == ".json":
+            json.dump({isolate: summary for isolate, summary in rows}, out, indent=2)
+            out.write("\n")
+        else:
+            scalar_fields = [key for key in rows[0][1] if key != 'length_histogram']
+            out.write("\t".join(["isolate"] + scalar_fields + [f"len_{label}" for label in LENGTH_BIN_LABELS]) + "\n")
+            for isolate, summary in rows:
+                values = ["" if summary[key] is None else str(summary[key]) for key in scalar_fields]
+                values.extend(str(count) for count in summary['length_histogram'].values())
+                out.write("\t".join([isolate] + values) + "\n")
+    
+    logging.info(f"Estatísticas salvas em: {output_file}")
+
+class IndexEntry(NamedTuple):
+    """Linha do índice: colunas do .fai seguidas da posição do registro e do isolado."""
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+    record_offset: int
+    record_size: int
+    isolate_id: str
+
+def index_path_for(fasta_path: Path) -> Path:
+    """Retorna o caminho do índice de um arquivo FASTA."""
+    return fasta_path.with_name(fasta_path.name + INDEX_SUFFIX)
+
+def _index_entry(record: FastaRecord, isolate_id: Optional[str]) -> IndexEntry:
+    """Monta a linha de índice de um registro."""
+    buf = record.buffer
+    line_end = buf.find(b"\n", record.seq_start, record.seq_end)
+    if line_end < 0:
+        line_width = record.seq_end - record.seq_start
+        line_bases = record.length
+    else:
+        line_width = line_end - record.seq_start + 1
+        line_bases = line_width - 1 - (1 if buf[line_end - 1] == 13 else 0)
+    
+    return IndexEntry(
+        record.id,
+        record.length,
+        record.offset + (record.seq_start - record.start),
+        line_bases,
+        line_width,
+        record.offset,
+        record.seq_end - record.start,
+        isolate_id or ""
+    )
+
+def build_fasta_index(
+    input_path: Path,
+    extractor: IsolateIdExtractor,
+    custom_pattern: Optional[str] = None,
+    index_path: Optional[Path] = None
+) -> Path:
+    """
+    Grava o índice de um arquivo FASTA em uma única passagem.
+    
+    Além das colunas do .fai (nome, tamanho, offset da sequência, bases e
+    bytes por linha), cada linha guarda o offset e o tamanho em bytes do
+    registro completo e o ID do isolado resolvido. O cabeçalho do índice
+    registra tamanho e mtime da entrada e o padrão customizado usado (em
+    JSON, para que tabulações e quebras de linha não corrompam a linha),
+    para detectar índices desatualizados.
+    
+    Args:
+        index_path: Onde gravar o índice (padrão: ao lado da entrada)
+    
+    Returns:
+        Caminho do índice criado
+    """
+    if detect_compression(input_path):
+        raise ValueError(f"O índice requer um arquivo FASTA não compactado: {input_path}")
+    
+    if index_path is None:
+        index_path = index_path_for(input_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    source = input_path.stat()
+    entries = 0
+    
+    try:
+        with open(input_path, "rb") as handle, open(tmp_path, "w", buffering=WRITE_BUFFER_SIZE) as out:
+            out.write(f"#contig_separator_index\t{INDEX_VERSION}\n")
+            out.write(f"#source_size\t{source.st_size}\n")
+            out.write(f"#source_mtime_ns\t{source.st_mtime_ns}\n")
+            out.write(f"#custom_pattern\t{json.dumps(custom_pattern or '')}\n")
+            for record in iter_fasta_records(handle):
+                entry = _index_entry(record, extractor.extract(record.description))
+                out.write("\t".join(map(str, entry)) + "\n")
+                entries += 1
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    logging.info(f"Índice criado: {index_path} ({entries} contigs)")
+    return index_path
+
+def load_fasta_index(
+    input_path: Path,
+    custom_pattern: Optional[str] = None,
+    index_path: Optional[Path] = None
+) -> Optional[List[IndexEntry]]:
+    """
+    Carrega o índice de um arquivo FASTA.
+    
+    Args:
+        index_path: Caminho do índice (padrão: ao lado da entrada)
+    
+    Returns:
+        Lista de entradas, ou None se o índice não existir, estiver
+        desatualizado ou tiver sido criado com outro padrão customizado
+    """
+    if index_path is None:
+        index_path = index_path_for(input_path)
+    if not index_path.exists():
+        return None
+    
+    source = input_path.stat()
+    expected = {
+        "contig_separator_index": INDEX_VERSION,
+        "source_size": str(source.st_size),
+        "source_mtime_ns": str(source.st_mtime_ns),
+        "custom_pattern": json.dumps(custom_pattern or ""),
+    }
+    meta = {}
+    entries = []
+    
+    with open(index_path) as handle:
+        for line in handle:
+            fields = line.rstrip("\n").split("\t")
+            if line.startswith("#"):
+                meta[fields[0][1:]] = fields[1] if len(fields) > 1 else ""
+                continue
+            entries.append(IndexEntry(
+                fields[0], int(fields[1]), int(fields[2]), int(fields[3]),
+                int(fields[4]), int(fields[5]), int(fields[6]), fields[7]
+            ))
+    
+    if meta != expected:
+        logging.warning(f"Índice desatualizado ou de outro padrão: {index_path}")
+        return None
+    return entries
+
+def load_or_build_index(
+    input_path: Path,
+    extractor: IsolateIdExtractor,
+    custom_pattern: Optional[str] = None,
+    fallback_dir: Optional[Path] = None
+) -> List[IndexEntry]:
+    """
+    Carrega o índice de um arquivo FASTA, criando-o se necessário.
+    
+    O índice fica ao lado da entrada; se a pasta da entrada não aceitar
+    escrita (ex.: arquivo de um acervo somente leitura), ele é criado em
+    fallback_dir, com o nome identificado pelo caminho completo da entrada.
+    """
+    index_paths = [index_path_for(input_path)]
+    if fallback_dir is not None:
+        source_id = hashlib.blake2b(str(input_path.resolve()).encode(), digest_size=4).hexdigest()
+        index_paths.append(fallback_dir / f"{input_path.name}.{source_id}{INDEX_SUFFIX}")
+    
+    for index_path in index_paths:
+        entries = load_fasta_index(input_path, custom_pattern, index_path)
+        if entries is not None:
+            return entries
+    
+    for index_path in index_paths:
+        logging.info(f"Criando índice para {input_path}: {index_path}")
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            build_fasta_index(input_path, extractor, custom_pattern, index_path)
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar o índice em {index_path}: {e}")
+            continue
+        
+        entries = load_fasta_index(input_path, custom_pattern, index_path)
+        if entries is None:
+            raise RuntimeError(f"O índice recém-criado não pôde ser carregado: {index_path} "
+                               f"(a entrada foi modificada durante a indexação?)")
+        return entries
+    
+    raise OSError(f"Não foi possível gravar o índice de {input_path}")
+
+def iter_indexed_records(input_path: Path, entries: List[IndexEntry]) -> Iterator[Tuple[IndexEntry, FastaRecord]]:
+    """
+    Lê diretamente do disco os registros listados (em ordem de arquivo).
+    
+    Registros consecutivos no arquivo são lidos juntos em um único bloco.
+    """
+    with open(input_path, "rb") as handle:
+        i = 0
+        while i < len(entries):
+            # Agrupar registros contíguos em uma única leitura
+            j = i + 1
+            run_end = entries[i].record_offset + entries[i].record_size
+            while (j < len(entries) and entries[j].record_offset == run_end
+                   and run_end - entries[i].record_offset < READ_CHUNK_SIZE):
+                run_end += entries[j].record_size
+                j += 1
+            
+            run_start = entries[i].record_offset
+            handle.seek(run_start)
+            buf = handle.read(run_end - run_start)
+            for entry in entries[i:j]:
+                start = entry.record_offset - run_start
+                yield entry, make_fasta_record(buf, start, start + entry.record_size, run_start)
+            i = j
+
+def isolate_output_file(
+    directory: Path,
+    isolate_id: str,
+    output_format: str = "fasta",
+    compress: Optional[str] = None
+) -> Path:
+    """Retorna o caminho do arquivo de saída de um isolado em um diretório."""
+    extension = "gbk" if output_format.lower() == "genbank" else "fasta"
+    return directory / compressed_name(f"{isolate_id}.{extension}", compress)
+
+def log_created_files(contig_counts: Dict[str, int], output_file, dry_run: bool) -> None:
+    """Registra no log os arquivos de isolado gerados (ou que seriam gerados)."""
+    for isolate_id, count in contig_counts.items():
+        path = output_file(isolate_id)
+        if dry_run:
+            logging.info(f"[DRY RUN] Criaria arquivo: {path} com {count} contigs")
+        else:
+            logging.info(f"Criado: {path} ({count} contigs)")
+
+class IsolateWriterPool:
+    """
+    Escreve contigs nos arquivos de seus isolados à medida que são lidos.
+    
+    Mantém no máximo `max_open_files` arquivos abertos (política LRU), com
+    escrita bufferizada. Um arquivo fechado por falta de espaço no pool é
+    reaberto em modo append quando o isolado volta a aparecer (também com
+    saída compactada: membros gzip/BGZF e frames zstd podem ser concatenados).
+    """
+    
+    def __init__(
+        self,
+        output_path: Path,
+        output_format: str = "fasta",
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+        dry_run: bool = False,
+        log_files: bool = True,
+        compress: Optional[str] = None,
+        compress_threads: int = 1
+    ):
+        self.output_path = output_path
+        self.output_format = output_format.lower()
+        self.max_open_files = max(1, max_open_files)
+        self.dry_run = dry_run
+        self.log_files = log_files
+        self.compress = compress
+        self.compress_threads = compress_threads
+        self.handles: "OrderedDict[str, BinaryIO]" = OrderedDict()
+        self.contig_counts: Counter = Counter()
+        self.failed: set = set()
+    
+    def output_file(self, isolate_id: str) -> Path:
+        """Retorna o caminho do arquivo de saída de um isolado."""
+        return isolate_output_file(self.output_path, isolate_id, self.output_format, self.compress)
+    
+    def _get_handle(self, isolate_id: str) -> BinaryIO:
+        """Obtém o handle do isolado, abrindo-o e fechando o menos recente se necessário."""
+        handle = self.handles.get(isolate_id)
+        if handle is not None:
+            self.handles.move_to_end(isolate_id)
+            return handle
+        
+        while len(self.handles) >= self.max_open_files:
+            _, oldest = self.handles.popitem(last=False)
+            oldest.close()
+        
+        # Primeiro acesso trunca o arquivo; reaberturas acrescentam ao final.
+        # Cada compressor zstd multithread cria o próprio pool de threads, então
+        # com centenas de arquivos abertos o zstd fica em modo single-thread;
+        # gzip/BGZF compartilham um único pool entre todos os arquivos.
+        threads = 1 if self.compress == "zst" else self.compress_threads
+        handle = open_output(
+            self.output_file(isolate_id),
+            self.compress,
+            threads,
+            append=isolate_id in self.contig_counts,
+            buffer_size=WRITE_BUFFER_SIZE
+        )
+        self.handles[isolate_id] = handle
+        return handle
+    
+    def write(self, isolate_id: str, record: FastaRecord) -> None:
+        """Anexa um contig ao arquivo do seu isolado."""
+        if isolate_id in self.failed:
+            return
+        
+        if not self.dry_run:
+            try:
+                handle = self._get_handle(isolate_id)
+                if self.output_format == "genbank":
+                    handle.write(format_genbank_record(record))
+                else:
+                    write_fasta_record(handle, record)
+            except Exception as e:
+                logging.error(f"Erro ao escrever arquivo {self.output_file(isolate_id)}: {e}")
+                self.failed.add(isolate_id)
+                self.contig_counts.pop(isolate_id, None)
+                handle = self.handles.pop(isolate_id, None)
+                if handle is not None:
+                    handle.close()
+                return
+        
+        self.contig_counts[isolate_id] += 1
+    
+    def close(self) -> None:
+        """Fecha todos os arquivos abertos e registra os arquivos gerados."""
+        while self.handles:
+            _, handle = self.handles.popitem(last=False)
+            handle.close()
+        
+        if self.log_files:
+            log_created_files(self.contig_counts, self.output_file, self.dry_run)
+    
+    def __enter__(self) -> "IsolateWriterPool":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+class ContigDeduplicator:
+    """
+    Detecta contigs com sequência idêntica dentro de cada isolado.
+    
+    Guarda apenas um hash de 128 bits por contig, em um conjunto por
+    isolado. As sequências são comparadas sem as quebras de linha, de modo
+    que a largura das linhas não afeta a detecção.
+    """
+    
+    def __init__(self, mode: str = "drop"):
+        self.mode = mode
+        self.digest = sequence_digest_function()
+        self.seen: Dict[str, set] = {}
+        self.duplicates: Counter = Counter()
+    
+    def is_duplicate(self, isolate_id: str, record: FastaRecord) -> bool:
+        """Registra o contig e indica se ele já apareceu no isolado."""
+        seen = self.seen.get(isolate_id)
+        if seen is None:
+            seen = self.seen[isolate_id] = set()
+        
+        key = self.digest(record.sequence())
+        if key not in seen:
+            seen.add(key)
+            return False
+        
+        self.duplicates[isolate_id] += 1
+        logging.debug(f"Contig duplicado em {isolate_id}: {record.id}")
+        return True
+    
+    def should_write(self, isolate_id: str, record: FastaRecord) -> bool:
+        """Indica se o contig deve ser escrito (duplicados só são removidos no modo drop)."""
+        return not self.is_duplicate(isolate_id, record) or self.mode != "drop"
+    
+    @property
+    def total(self) -> int:
+        return sum(self.duplicates.values())
+
+def separate_records(
+    handle: BinaryIO,
+    extractor: IsolateIdExtractor,
+    writers: IsolateWriterPool,
+    stats: Dict,
+    min_length: int = 0,
+    max_length: Optional[int] = None,
+    composition: bool = False,
+    deduplicator: Optional[ContigDeduplicator] = None
+) -> int:
+    """
+    Passagem única sobre um arquivo: estatísticas e escrita por isolado.
+    
+    A composição (GC/N) só é calculada com `composition`, pois exige
+    percorrer todas as bases. Sem ela, o filtro de tamanho é aplicado
+    durante a leitura, e contigs longos rejeitados não são carregados.
+    Com `deduplicator`, contigs repetidos de um isolado são detectados na
+    mesma passagem.
+    
+    Returns:
+        Número de sequências filtradas por tamanho
+    """
+    filtered_sequences = 0
+    
+    if composition:
+        records = iter_fasta_records(handle)
+    else:
+        records = iter_fasta_records(handle, min_length=min_length, max_length=max_length)
+    
+    for record in records:
+        seq_length = record.length
+        description = record.description
+        isolate_id = extractor.extract(description)
+        gc, n = record.composition() if composition else (None, None)
+        update_analysis_stats(stats, seq_length, isolate_id, description, gc, n)
+        
+        # Aplicar filtros de tamanho
+        if seq_length < min_length:
+            filtered_sequences += 1
+            continue
+        if max_length and seq_length > max_length:
+            filtered_sequences += 1
+            continue
+        
+        if isolate_id:
+            if deduplicator is None or deduplicator.should_write(isolate_id, record):
+                writers.write(isolate_id, record)
+        else:
+            logging.warning(f"Contig não identificado: {record.id}")
+    
+    return filtered_sequences
+
+class RangeReader:
+    """Leitor binário limitado ao intervalo [start, end) de um arquivo."""
+    
+    def __init__(self, handle: BinaryIO, start: int, end: int):
+        handle.seek(start)
+        self.handle = handle
+        self.remaining = end - start
+    
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+def plan_byte_ranges(input_path: Path, parts: int) -> List[Tuple[int, int]]:
+    """
+    Divide o arquivo em até `parts` intervalos alinhados no início de registros.
+    
+    Cada corte é deslocado para o próximo '>' no início de linha, de modo
+    que nenhum registro fique dividido entre dois intervalos.
+    """
+    size = input_path.stat().st_size
+    cuts = [0]
+    
+    with open(input_path, "rb") as handle:
+        for i in range(1, parts):
+            guess = max(size * i // parts, cuts[-1])
+            handle.seek(guess)
+            carry = b""
+            position = guess
+            while True:
+                block = handle.read(RANGE_SCAN_SIZE)
+                if not block:
+                    position = size
+                    break
+                data = carry + block
+                found = data.find(b"\n>")
+                if found >= 0:
+                    position = position - len(carry) + found + 1
+                    break
+                position += len(block)
+                carry = data[-1:]
+            cuts.append(position)
+    cuts.append(size)
+    
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+def _init_worker(log_level: int) -> None:
+    """Configura o logging nos processos de trabalho."""
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+def _separate_range(task: Tuple) -> Tuple[Dict, int, Counter, set]:
+    """
+    Separa os contigs de um intervalo do arquivo em arquivos parciais.
+    
+    Com start None, o arquivo inteiro é lido (entradas compactadas).
+    """
+    (input_path, start, end, partial_dir, custom_pattern,
+     min_length, max_length, output_format, max_open_files, dry_run, compress, composition) = task
+    
+    extractor = IsolateIdExtractor(get_regex_patterns(), custom_pattern)
+    stats = new_analysis_stats()
+    
+    if not dry_run:
+        partial_dir.mkdir()
+    with IsolateWriterPool(partial_dir, output_format, max_open_files, dry_run,
+                           log_files=False, compress=compress) as writers:
+        with (open_input(input_path) if start is None else open(input_path, "rb")) as handle:
+            reader = handle if start is None else RangeReader(handle, start, end)
+            filtered = separate_records(reader, extractor, writers, stats,
+                                        min_length, max_length, composition)
+    
+    return stats, filtered, writers.contig_counts, writers.failed
+
+def plan_input_ranges(input_paths: List[Path], threads: int) -> List[Tuple[Path, Optional[int], Optional[int]]]:
+    """
+    Divide as entradas em tarefas (arquivo, início, fim) para os processos.
+    
+    Arquivos não compactados recebem intervalos proporcionais ao seu
+    tamanho (todos os processos para uma única entrada); arquivos
+    compactados não podem ser divididos e formam uma tarefa cada.
+    """
+    plain = [path for path in input_paths if detect_compression(path) is None]
+    total_size = sum(path.stat().st_size for path in plain)
+    
+    ranges = []
+    for input_path in input_paths:
+        if input_path not in plain:
+            ranges.append((input_path, None, None))
+            continue
+        parts = max(1, round(threads * input_path.stat().st_size / total_size))
+        ranges.extend((input_path, start, end) for start, end in plan_byte_ranges(input_path, parts))
+    return ranges
+
+def separate_parallel(
+    input_paths: List[Path],
+    output_path: Path,
+    stats: Dict,
+    threads: int,
+    custom_pattern: Optional[str],
+    min_length: int,
+    max_length: Optional[int],
+    output_format: str,
+    max_open_files: int,
+    dry_run: bool,
+    compress: Optional[str] = None,
+    composition: bool = False
+) -> Tuple[int, "OrderedDict[str, int]", set]:
+    """
+    Separa contigs usando vários processos sobre intervalos dos arquivos.
+    
+    Cada processo escreve arquivos parciais por isolado para o seu
+    intervalo; no final, os parciais de cada isolado são concatenados na
+    ordem das entradas e dos intervalos, reproduzindo byte a byte a saída
+    serial. Com saída compactada, cada processo comprime os seus parciais e
+    a concatenação continua válida (o conteúdo descompactado é idêntico).
+    
+    Returns:
+        Tupla (sequências filtradas, contigs por isolado, isolados com erro)
+    """
+    ranges = plan_input_ranges(input_paths, threads)
+    logging.info(f"Processando {len(ranges)} intervalos com {threads} processos")
+    
+    work_dir = Path(tempfile.mkdtemp(prefix=".contig_separator_", dir=output_path)) if not dry_run else output_path
+    tasks = [
+        (input_path, start, end, work_dir / f"part{index:05d}", custom_pattern,
+         min_length, max_length, output_format, max_open_files, dry_run, compress, composition)
+        for index, (input_path, start, end) in enumerate(ranges)
+    ]
+    
+    filtered_sequences = 0
+    contig_counts: "OrderedDict[str, int]" = OrderedDict()
+    failed: set = set()
+    partials: "OrderedDict[str, List[Path]]" = OrderedDict()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=threads, initializer=_init_worker,
+                                 initargs=(logging.getLogger().getEffectiveLevel(),)) as executor:
+            for task, (part_stats, filtered, counts, part_failed) in zip(tasks, executor.map(_separate_range, tasks)):
+                merge_analysis_stats(stats, part_stats)
+                filtered_sequences += filtered
+                failed.update(part_failed)
+                partial_dir = task[3]
+                for isolate_id, count in counts.items():
+                    contig_counts[isolate_id] = contig_counts.get(isolate_id, 0) + count
+                    partials.setdefault(isolate_id, []).append(
+                        isolate_output_file(partial_dir, isolate_id, output_format, compress))
+        
+        if not dry_run:
+            for isolate_id, files in partials.items():
+                if isolate_id in failed:
+                    continue
+                output_file = isolate_output_file(output_path, isolate_id, output_format, compress)
+                # O primeiro parcial é movido; os demais são acrescentados em ordem
+                os.replace(files[0], output_file)
+                if len(files) > 1:
+                    with open(output_file, "r+b", buffering=0) as out:
+                        out.seek(0, os.SEEK_END)
+                        for partial in files[1:]:
+                            append_file(partial, out)
+    finally:
+        if not dry_run:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    for isolate_id in failed:
+        contig_counts.pop(isolate_id, None)
+    
+    return filtered_sequences, contig_counts, failed
+
 def separar_contigs_por_isolado(
-    fasta_path: str,
+    fasta_path,
     output_dir: str,
     custom_pattern: Optional[str] = None,
     min_length: int = 0,
     max_length: Optional[int] = None,
     dry_run: bool = False,
     analyze_only: bool = False,
-    output_format: str = "fasta"
+    output_format: str = "fasta",
+    max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    isolates: Optional[List[str]] = None,
+    threads: int = 1,
+    compress: Optional[str] = None,
+    compress_threads: int = 1,
+    stats_output: Optional[str] = None,
+    dedup: Optional[str] = None
 ) -> Dict:
     """
-    Separa contigs de um arquivo multi-FASTA em arquivos individuais.
+    Separa contigs de um ou mais arquivos multi-FASTA em arquivos individuais.
+    
+    Com várias entradas, os contigs de um mesmo isolado vindos de arquivos
+    diferentes são reunidos em um único arquivo de saída, na ordem das
+    entradas, e as estatísticas formam um único relatório.
     
     Args:
-        fasta_path: Caminho do arquivo FASTA de entrada
+        fasta_path: Arquivo FASTA de entrada, ou lista de arquivos/padrões glob
         output_dir: Diretório de saída
         custom_pattern: Padrão regex customizado
         min_length: Tamanho mínimo dos contigs
@@ -163,20 +1040,34 @@ def separar_contigs_por_isolado(
         dry_run: Apenas simula as operações
         analyze_only: Apenas analisa o arquivo sem separar
         output_format: Formato de saída (fasta, genbank)
+        max_open_files: Máximo de arquivos de saída abertos simultaneamente
+        isolates: Extrair apenas estes isolados, lendo-os via índice
+        threads: Número de processos para separar intervalos dos arquivos
+        compress: Compactação dos arquivos de saída (gz, bgzf, zst)
+        compress_threads: Threads de compressão no modo serial
+        stats_output: Arquivo .json/.tsv para as estatísticas por isolado
+        dedup: Contigs idênticos no mesmo isolado: 'drop' remove, 'report' apenas conta
     
     Returns:
         Dicionário com estatísticas da operação
     """
-    # Validar entrada
-    input_path = validate_input_file(fasta_path)
-    patterns = get_regex_patterns()
-    
-    # Analisar arquivo
-    logging.info(f"Analisando arquivo: {input_path}")
-    stats = analyze_fasta_file(input_path, patterns, custom_pattern)
-    print_analysis_report(stats)
+    # Validar entradas
+    if isinstance(fasta_path, (list, tuple)):
+        input_paths = expand_input_paths(list(fasta_path))
+    else:
+        input_paths = [validate_input_file(fasta_path)]
+    if len(input_paths) > 1:
+        logging.info(f"Arquivos de entrada: {len(input_paths)}")
+    extractor = IsolateIdExtractor(get_regex_patterns(), custom_pattern)
     
     if analyze_only:
+        stats = new_analysis_stats()
+        for input_path in input_paths:
+            logging.info(f"Analisando arquivo: {input_path}")
+            merge_analysis_stats(stats, analyze_fasta_file(input_path, extractor))
+        print_analysis_report(stats)
+        if stats_output:
+            write_stats_report(stats, Path(stats_output))
         return stats
     
     # Preparar diretório de saída
@@ -185,68 +1076,112 @@ def separar_contigs_por_isolado(
         output_path.mkdir(parents=True, exist_ok=True)
         logging.info(f"Diretório de saída: {output_path}")
     
-    # Agrupar contigs por isolado
-    isolados = defaultdict(list)
+    stats = new_analysis_stats()
     filtered_sequences = 0
+    composition = stats_output is not None
+    deduplicator = ContigDeduplicator(dedup) if dedup else None
+    start_time = time.perf_counter()
     
-    for record in SeqIO.parse(input_path, "fasta"):
-        # Aplicar filtros de tamanho
-        seq_length = len(record.seq)
-        if seq_length < min_length:
-            filtered_sequences += 1
-            continue
-        if max_length and seq_length > max_length:
-            filtered_sequences += 1
-            continue
+    if deduplicator and threads > 1 and not isolates:
+        # Os conjuntos de hashes precisam ver todos os contigs de cada isolado
+        logging.warning("--dedup requer um único conjunto de hashes; processando em modo serial")
+        threads = 1
+    
+    if len(input_paths) == 1 and threads > 1:
+        input_compression = detect_compression(input_paths[0])
+        if input_compression:
+            logging.warning(f"Entrada compactada ({input_compression}) não pode ser dividida; "
+                            "processando em modo serial")
+            threads = 1
+    
+    if isolates:
+        # Modo de extração: o índice substitui a varredura completa
+        wanted = set(isolates)
+        found = set()
+        selected = []
+        for input_path in input_paths:
+            entries = load_or_build_index(input_path, extractor, custom_pattern, output_path)
+            
+            input_selected = []
+            for entry in entries:
+                update_analysis_stats(stats, entry.length, entry.isolate_id, entry.name)
+                if entry.isolate_id not in wanted:
+                    continue
+                found.add(entry.isolate_id)
+                if entry.length < min_length or (max_length and entry.length > max_length):
+                    filtered_sequences += 1
+                    continue
+                input_selected.append(entry)
+            selected.append((input_path, input_selected))
         
-        isolate_id = extract_isolate_id(record.description, patterns, custom_pattern)
+        for isolate_id in sorted(wanted - found):
+            logging.warning(f"Isolado não encontrado no índice: {isolate_id}")
         
-        if isolate_id:
-            isolados[isolate_id].append(record)
-        else:
-            logging.warning(f"Contig não identificado: {record.id}")
+        logging.info(f"Extraindo {sum(len(entries) for _, entries in selected)} contigs "
+                     f"de {len(found)} isolados")
+        with IsolateWriterPool(output_path, output_format, max_open_files, dry_run,
+                               compress=compress, compress_threads=compress_threads) as writers:
+            for input_path, entries in selected:
+                for entry, record in iter_indexed_records(input_path, entries):
+                    if deduplicator is None or deduplicator.should_write(entry.isolate_id, record):
+                        writers.write(entry.isolate_id, record)
+        contig_counts, failed = writers.contig_counts, writers.failed
+    elif threads > 1:
+        for input_path in input_paths:
+            logging.info(f"Processando arquivo: {input_path}")
+        filtered_sequences, contig_counts, failed = separate_parallel(
+            input_paths, output_path, stats, threads, custom_pattern,
+            min_length, max_length, output_format, max_open_files, dry_run, compress, composition
+        )
+        log_created_files(contig_counts, lambda isolate_id: isolate_output_file(
+            output_path, isolate_id, output_format, compress), dry_run)
+    else:
+        # Passagem única por entrada: estatísticas de análise e escrita direta
+        # por isolado; o mesmo conjunto de escritores reúne as entradas
+        with IsolateWriterPool(output_path, output_format, max_open_files, dry_run,
+                               compress=compress, compress_threads=compress_threads) as writers:
+            for input_path in input_paths:
+                logging.info(f"Processando arquivo: {input_path}")
+                try:
+                    with open_input(input_path) as handle:
+                        filtered_sequences += separate_records(handle, extractor, writers, stats,
+                                                               min_length, max_length, composition,
+                                                               deduplicator)
+                except Exception as e:
+                    logging.error(f"Erro ao processar arquivo FASTA {input_path}: {e}")
+                    raise
+        contig_counts, failed = writers.contig_counts, writers.failed
+    
+    elapsed = time.perf_counter() - start_time
+    input_size = sum(input_path.stat().st_size for input_path in input_paths)
+    
+    print_analysis_report(stats)
+    if stats_output:
+        write_stats_report(stats, Path(stats_output))
     
     if filtered_sequences > 0:
         logging.info(f"Sequências filtradas por tamanho: {filtered_sequences}")
     
-    # Escrever arquivos separados
-    files_created = 0
-    total_contigs_written = 0
-    
-    for isolado, contigs in isolados.items():
-        if not contigs:
-            continue
-            
-        # Definir nome do arquivo de saída
-        if output_format.lower() == "genbank":
-            output_file = output_path / f"{isolado}.gbk"
-        else:
-            output_file = output_path / f"{isolado}.fasta"
-        
-        if dry_run:
-            logging.info(f"[DRY RUN] Criaria arquivo: {output_file} com {len(contigs)} contigs")
-        else:
-            try:
-                with open(output_file, "w") as out_f:
-                    SeqIO.write(contigs, out_f, output_format.lower())
-                
-                logging.info(f"Criado: {output_file} ({len(contigs)} contigs)")
-                files_created += 1
-                total_contigs_written += len(contigs)
-                
-            except Exception as e:
-                logging.error(f"Erro ao criar arquivo {output_file}: {e}")
+    if deduplicator and deduplicator.duplicates:
+        logging.info("Contigs duplicados por isolado:")
+        for isolate_id, count in sorted(deduplicator.duplicates.items()):
+            logging.info(f"  {isolate_id}: {count}")
     
     # Atualizar estatísticas
     operation_stats = {
-        'input_file': str(input_path),
+        'input_file': str(input_paths[0]) if len(input_paths) == 1 else f"{len(input_paths)} arquivos",
+        'input_files': [str(input_path) for input_path in input_paths],
         'output_directory': str(output_path),
         'total_input_sequences': stats['total_sequences'],
-        'identified_isolates': len(isolados),
-        'files_created': files_created,
-        'total_contigs_written': total_contigs_written,
+        'identified_isolates': len(contig_counts) + len(failed),
+        'files_created': 0 if dry_run else len(contig_counts),
+        'total_contigs_written': 0 if dry_run else sum(contig_counts.values()),
         'filtered_sequences': filtered_sequences,
-        'unidentified_sequences': stats['unidentified_sequences']
+        'unidentified_sequences': stats['unidentified_sequences'],
+        'dedup_mode': dedup,
+        'duplicate_contigs': deduplicator.total if deduplicator else 0,
+        'elapsed_seconds': elapsed,
+        'throughput_mb_s': input_size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
     }
     
     return operation_stats
@@ -256,16 +1191,27 @@ def print_operation_summary(stats: Dict) -> None:
     logging.info("=" * 60)
     logging.info("RESUMO DA OPERAÇÃO")
     logging.info("=" * 60)
-    logging.info(f"Arquivo de entrada: {stats['input_file']}")
+    if len(stats['input_files']) > 1:
+        logging.info(f"Arquivos de entrada: {len(stats['input_files'])}")
+    else:
+        logging.info(f"Arquivo de entrada: {stats['input_file']}")
     logging.info(f"Diretório de saída: {stats['output_directory']}")
     logging.info(f"Sequências de entrada: {stats['total_input_sequences']}")
     logging.info(f"Isolados identificados: {stats['identified_isolates']}")
     logging.info(f"Arquivos criados: {stats['files_created']}")
     logging.info(f"Contigs escritos: {stats['total_contigs_written']}")
     
+    logging.info(f"Tempo de processamento: {stats['elapsed_seconds']:.1f} s "
+                 f"({stats['throughput_mb_s']:.1f} MB/s)")
+    
     if stats['filtered_sequences'] > 0:
         logging.info(f"Sequências filtradas: {stats['filtered_sequences']}")
     
+    if stats['dedup_mode'] == "drop":
+        logging.info(f"Contigs duplicados removidos: {stats['duplicate_contigs']}")
+    elif stats['dedup_mode'] == "report":
+        logging.info(f"Contigs duplicados encontrados (mantidos): {stats['duplicate_contigs']}")
+    
     if stats['unidentified_sequences'] > 0:
         logging.warning(f"Sequências não identificadas: {stats['unidentified_sequences']}")
     
@@ -282,8 +1228,53 @@ def validate_dependencies() -> bool:
         logging.error("Instale com: pip install biopython")
         return False
 
+def main_index(argv: List[str]) -> None:
+    """Subcomando 'index': grava o índice de um ou mais arquivos FASTA."""
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} index",
+        description="Cria o índice de contigs (offsets e isolados) de arquivos multi-FASTA",
+        epilog=f"""
+O índice é gravado ao lado da entrada (input.fasta{INDEX_SUFFIX}) e usado por
+--isolates para extrair isolados sem varrer o arquivo inteiro.
+
+Exemplos de uso:
+  %(prog)s input.fasta
+  %(prog)s input.fasta --custom-pattern "isolate_(\\d+)"
+        """,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "fasta_path",
+        nargs="+",
+        help="Arquivo(s) FASTA a indexar"
+    )
+    parser.add_argument(
+        "--custom-pattern",
+        help="Padrão regex customizado para extrair ID do isolado"
+    )
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="Saída detalhada"
+    )
+    
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+    
+    try:
+        extractor = IsolateIdExtractor(get_regex_patterns(), args.custom_pattern)
+        for fasta_path in args.fasta_path:
+            build_fasta_index(validate_input_file(fasta_path), extractor, args.custom_pattern)
+    except Exception as e:
+        logging.error(f"Erro ao criar índice: {e}")
+        sys.exit(1)
+
 def main():
     """Função principal do script."""
+    if len(sys.argv) > 1 and sys.argv[1] == "index":
+        main_index(sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(
         description="Separador inteligente de contigs multi-FASTA",
         epilog="""
@@ -302,19 +1293,33 @@ Formatos de saída:
   - FASTA (padrão)
   - GenBank
 
+Compactação:
+  - Entrada gzip, BGZF ou zstd detectada automaticamente
+  - Saída compactada com --compress gz|bgzf|zst
+
 Exemplos de uso:
   %(prog)s input.fasta output_dir/
   %(prog)s input.fasta output_dir/ --custom-pattern "isolate_(\d+)"
   %(prog)s input.fasta output_dir/ --min-length 500 --max-length 10000
   %(prog)s input.fasta output_dir/ --analyze-only
+  %(prog)s input.fasta output_dir/ --analyze-only --stats-output qc.tsv
   %(prog)s input.fasta output_dir/ --dry-run --verbose
+  %(prog)s index input.fasta
+  %(prog)s input.fasta output_dir/ --isolates S10_005,N3_007
+  %(prog)s input.fasta output_dir/ --threads 16
+  %(prog)s input.fasta.gz output_dir/ --compress bgzf
+  %(prog)s run1.fasta run2.fasta output_dir/
+  %(prog)s "runs/*.fasta.gz" output_dir/ --threads 8
+  %(prog)s export1.fasta export2.fasta output_dir/ --dedup drop
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
     
     parser.add_argument(
-        "fasta_path", 
-        help="Caminho do arquivo FASTA multi-sequência"
+        "fasta_path",
+        nargs="+",
+        help="Arquivo(s) FASTA multi-sequência ou padrões glob (ex.: 'runs/*.fasta.gz'); "
+             "contigs do mesmo isolado em entradas diferentes são reunidos"
     )
     parser.add_argument(
         "output_dir", 
@@ -341,11 +1346,54 @@ Exemplos de uso:
         default="fasta",
         help="Formato de saída (padrão: fasta)"
     )
+    parser.add_argument(
+        "--isolates",
+        type=lambda value: [item.strip() for item in value.split(",") if item.strip()],
+        help="Extrai apenas estes isolados (separados por vírgula) usando o índice "
+             f"{INDEX_SUFFIX}, criado automaticamente se necessário (na pasta de saída "
+             "se a pasta da entrada for somente leitura)"
+    )
+    parser.add_argument(
+        "--threads", "-t",
+        type=int,
+        default=1,
+        help="Processos para separar as entradas em paralelo; arquivos não compactados "
+             "são divididos em intervalos (padrão: 1)"
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSION_CHOICES,
+        help="Compacta os arquivos de saída (gz, bgzf ou zst)"
+    )
+    parser.add_argument(
+        "--compress-threads",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Threads de compressão gzip/BGZF no modo serial; saídas zstd por isolado "
+             "são comprimidas em uma thread cada (padrão: número de CPUs)"
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=DEDUP_CHOICES,
+        help="Detecta contigs com sequência idêntica no mesmo isolado: "
+             "drop remove as cópias, report apenas as conta"
+    )
+    parser.add_argument(
+        "--max-open-files",
+        type=int,
+        default=DEFAULT_MAX_OPEN_FILES,
+        help=f"Máximo de arquivos de saída abertos ao mesmo tempo (padrão: {DEFAULT_MAX_OPEN_FILES})"
+    )
     parser.add_argument(
         "--analyze-only", "-a",
         action="store_true",
         help="Apenas analisa o arquivo sem separar contigs"
     )
+    parser.add_argument(
+        "--stats-output",
+        help="Grava estatísticas por isolado (contigs, tamanho, N50/L50, GC%%, N, "
+             "histograma) em JSON (.json) ou TSV (outras extensões)"
+    )
     parser.add_argument(
         "--dry-run", "-n",
         action="store_true",
@@ -361,8 +1409,8 @@ Exemplos de uso:
     
     setup_logging(args.verbose)
     
-    # Verificar dependências
-    if not validate_dependencies():
+    # Biopython só é necessário para saída GenBank
+    if args.output_format == "genbank" and not validate_dependencies():
         sys.exit(1)
     
     if args.dry_run:
@@ -380,7 +1428,14 @@ Exemplos de uso:
             args.max_length,
             args.dry_run,
             args.analyze_only,
-            args.output_format
+            args.output_format,
+            args.max_open_files,
+            args.isolates,
+            args.threads,
+            args.compress,
+            args.compress_threads,
+            args.stats_output,
+            args.dedup
         )
         
         if not args.analyze_only:
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+E/S compartilhada pelas ferramentas FASTA
+Detecta automaticamente a compactação da entrada (gzip, BGZF, zstd), grava
+saídas compactadas em blocos, comprimidos em paralelo por um pool de threads,
+e lê registros FASTA diretamente como bytes, sem copiar as sequências.
+
+Dependências opcionais:
+  zstandard  - arquivos .zst (pip install zstandard)
+  isal       - descompressão gzip mais rápida (pip install isal)
+  xxhash     - hash de sequências mais rápido (pip install xxhash)
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Formatos de compactação de saída aceitos por --compress
+COMPRESSION_CHOICES = ["gz", "bgzf", "zst"]
+
+# Sufixo acrescentado ao nome dos arquivos de saída
+COMPRESSION_SUFFIXES = {"gz": ".gz", "bgzf": ".gz", "zst": ".zst"}
+
+# Tamanho (descompactado) dos blocos comprimidos em paralelo
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+BGZF_BLOCK_SIZE = 0xff00  # mesmo limite do htslib, para caber em 64 KiB
+COMPRESSION_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Tamanho máximo de cada chamada de cópia entre arquivos
+COPY_BLOCK_SIZE = 1 << 30
+
+# Tamanho dos blocos lidos pelo parser FASTA
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Bytes removidos por translate() para contar G+C
+NON_GC_BYTES = bytes(byte for byte in range(256) if byte not in b"GCgc")
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+BGZF_HEADER = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def detect_compression(path: Path) -> Optional[str]:
+    """
+    Identifica a compactação de um arquivo pelos bytes iniciais.
+    
+    Returns:
+        'gz', 'bgzf', 'zst' ou None para texto puro
+    """
+    with open(path, "rb") as handle:
+        head = handle.read(16)
+    
+    if head.startswith(ZSTD_MAGIC):
+        return "zst"
+    if head.startswith(GZIP_MAGIC):
+        # BGZF: gzip com campo extra 'BC' no primeiro membro
+        if len(head) >= 14 and head[3] & 4 and head[12:14] == b"BC":
+            return "bgzf"
+        return "gz"
+    return None
+
+def _require_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Suporte a .zst requer o pacote zstandard (pip install zstandard)")
+    return zstandard
+
+def open_input(path: Path) -> BinaryIO:
+    """
+    Abre um arquivo para leitura binária, descompactando se necessário.
+    
+    A compactação é detectada pelo conteúdo, não pela extensão.
+    """
+    compression = detect_compression(path)
+    
+    if compression in ("gz", "bgzf"):
+        try:
+            from isal import igzip
+            return igzip.open(path, "rb")
+        except ImportError:
+            return gzip.open(path, "rb")
+    
+    if compression == "zst":
+        zstandard = _require_zstandard()
+        raw = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader, buffer_size=DEFAULT_BLOCK_SIZE)
+    
+    return open(path, "rb")
+
+def get_executor(threads: int) -> ThreadPoolExecutor:
+    """Pool de threads de compressão compartilhado entre os arquivos de saída."""
+    with _executors_lock:
+        executor = _executors.get(threads)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="compress")
+            _executors[threads] = executor
+        return executor
+
+def _compress_gzip_member(data: bytes) -> bytes:
+    """Comprime um bloco como membro gzip independente."""
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def _compress_bgzf_block(data: bytes) -> bytes:
+    """Comprime um bloco BGZF (gzip com o tamanho do bloco no campo extra)."""
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = len(BGZF_HEADER) + 2 + len(cdata) + 8
+    return (BGZF_HEADER + struct.pack("<H", block_size - 1) + cdata
+            + struct.pack("<II", zlib.crc32(data), len(data)))
+
+class BlockCompressWriter:
+    """
+    Escritor que comprime blocos independentes em paralelo.
+    
+    Os dados são acumulados em blocos de `block_size` bytes; cada bloco é
+    comprimido em uma thread do pool e gravado na ordem original. Membros
+    gzip (e blocos BGZF) concatenados formam um arquivo válido, por isso o
+    arquivo também pode ser reaberto em modo append.
+    """
+    
+    def __init__(self, raw: BinaryIO, compress: str, threads: int = 1, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.raw = raw
+        self.compress_block = _compress_bgzf_block if compress == "bgzf" else _compress_gzip_member
+        self.eof_marker = BGZF_EOF if compress == "bgzf" else b""
+        self.block_size = min(block_size, BGZF_BLOCK_SIZE) if compress == "bgzf" else block_size
+        self.threads = max(1, threads)
+        self.buffer = bytearray()
+        self.pending: Deque[Future] = deque()
+        self.closed = False
+    
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+    
+    def _submit(self, block: bytes) -> None:
+        if self.threads == 1:
+            self.raw.write(self.compress_block(block))
+            return
+        self.pending.append(get_executor(self.threads).submit(self.compress_block, block))
+        # Limitar blocos em voo para manter a memória constante
+        while len(self.pending) > 2 * self.threads:
+            self.raw.write(self.pending.popleft().result())
+    
+    def flush(self) -> None:
+        if self.closed:
+            return
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.raw.write(self.pending.popleft().result())
+        self.raw.flush()
+    
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self.raw.write(self.eof_marker)
+        finally:
+            self.closed = True
+            self.raw.close()
+    
+    def __enter__(self) -> "BlockCompressWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def open_output(
+    path: Path,
+    compress: Optional[str] = None,
+    threads: int = 1,
+    append: bool = False,
+    buffer_size: int = DEFAULT_BLOCK_SIZE
+) -> BinaryIO:
+    """
+    Abre um arquivo de saída binário, opcionalmente compactado.
+    
+    Args:
+        path: Caminho do arquivo (o sufixo de compactação não é acrescentado)
+        compress: None, 'gz', 'bgzf' ou 'zst'
+        threads: Threads de compressão (gzip/BGZF usam um pool compartilhado;
+            no zstd cada arquivo aberto cria o próprio pool)
+        append: Acrescenta ao final em vez de truncar
+        buffer_size: Tamanho do buffer/bloco de escrita
+    """
+    mode = "ab" if append else "wb"
+    
+    if compress is None:
+        return open(path, mode, buffering=buffer_size)
+    
+    if compress == "zst":
+        zstandard = _require_zstandard()
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=threads if threads > 1 else 0)
+        return compressor.stream_writer(open(path, mode), write_size=buffer_size, closefd=True)
+    
+    if compress not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compactação desconhecida: {compress}")
+    return BlockCompressWriter(open(path, mode), compress, threads, buffer_size)
+
+def sync_output(out: BinaryIO, path: Path) -> int:
+    """
+    Grava em disco tudo o que já foi escrito em `out` e retorna o tamanho
+    do arquivo nesse ponto.
+    
+    Saídas compactadas fecham o membro gzip/bloco BGZF/quadro zstd atual,
+    então o arquivo pode ser truncado nesse tamanho e continuado com
+    open_output(..., append=True).
+    """
+    zstandard = sys.modules.get("zstandard")
+    if zstandard is not None and isinstance(out, zstandard.ZstdCompressionWriter):
+        out.flush(zstandard.FLUSH_FRAME)
+    else:
+        out.flush()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        return os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+def compressed_name(name: str, compress: Optional[str]) -> str:
+    """Acrescenta ao nome do arquivo o sufixo da compactação escolhida."""
+    return name + COMPRESSION_SUFFIXES[compress] if compress else name
+
+def append_file(source: Path, destination: BinaryIO) -> None:
+    """
+    Acrescenta o conteúdo de um arquivo à posição atual de outro.
+    
+    Usa os.copy_file_range (cópia dentro do kernel) quando disponível. O
+    destino não pode ter O_APPEND, ex.: open(path, "r+b", buffering=0)
+    posicionado no final; destinos com buffer são esvaziados antes da cópia.
+    """
+    with open(source, "rb", buffering=0) as src:
+        copy_range(src, destination, 0, None)
+
+def copy_range(source: BinaryIO, destination: BinaryIO, offset: int, length: Optional[int]) -> None:
+    """
+    Copia `length` bytes de `source` a partir de `offset` (até o fim, se
+    None) para a posição atual de `destination`.
+    
+    Usa os.copy_file_range (cópia dentro do kernel) quando disponível, com
+    cópia em blocos como alternativa. A posição de `source` não é usada.
+    """
+    destination.flush()
+    remaining = length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while remaining is None or remaining > 0:
+                count = COPY_BLOCK_SIZE if remaining is None else min(remaining, COPY_BLOCK_SIZE)
+                copied = os.copy_file_range(source.fileno(), destination.fileno(), count, offset)
+                if not copied:
+                    break
+                offset += copied
+                if remaining is not None:
+                    remaining -= copied
+            # Sincronizar a posição de objetos com buffer após a cópia pelo descritor
+            destination.seek(0, os.SEEK_CUR)
+            return
+        except OSError:
+            # Sem suporte no sistema de arquivos: continua a partir dos
+            # offsets atuais com a cópia em espaço de usuário
+            destination.seek(0, os.SEEK_CUR)
+    
+    source.seek(offset)
+    while remaining is None or remaining > 0:
+        block = source.read(DEFAULT_BLOCK_SIZE if remaining is None else min(remaining, DEFAULT_BLOCK_SIZE))
+        if not block:
+            break
+        destination.write(block)
+        if remaining is not None:
+            remaining -= len(block)
+
+class FastaRecord(NamedTuple):
+    """
+    Registro FASTA leve, apontando para o bloco de bytes onde foi lido.
+    
+    O registro completo (linha de cabeçalho + linhas de sequência, como no
+    arquivo) ocupa buffer[start:seq_end]; a sequência ocupa
+    buffer[seq_start:seq_end]. Nenhuma cópia da sequência é feita.
+    """
+    header: bytes
+    buffer: bytes
+    start: int
+    seq_start: int
+    seq_end: int
+    length: int
+    offset: int
+    
+    @property
+    def description(self) -> str:
+        """Cabeçalho completo (sem o '>') como texto."""
+        return self.header.decode("utf-8", errors="replace")
+    
+    @property
+    def id(self) -> str:
+        """Primeira palavra do cabeçalho."""
+        parts = self.description.split(None, 1)
+        return parts[0] if parts else ""
+    
+    def raw(self) -> memoryview:
+        """Bytes originais do registro, sem cópia."""
+        return memoryview(self.buffer)[self.start:self.seq_end]
+    
+    def sequence_view(self) -> memoryview:
+        """Linhas de sequência como no arquivo (com quebras de linha), sem cópia."""
+        return memoryview(self.buffer)[self.seq_start:self.seq_end]
+    
+    def sequence(self) -> bytes:
+        """Sequência sem quebras de linha."""
+        return self.buffer[self.seq_start:self.seq_end].translate(None, b"\r\n")
+    
+    def composition(self) -> Tuple[int, int]:
+        """Contagens de G+C e de N (maiúsculas ou minúsculas) na sequência."""
+        block = self.buffer[self.seq_start:self.seq_end]
+        return len(block.translate(None, NON_GC_BYTES)), block.count(b"N") + block.count(b"n")
+
+def make_fasta_record(buf: bytes, start: int, end: int, base: int) -> FastaRecord:
+    """Monta um FastaRecord para o registro em buf[start:end]."""
+    header_end = buf.find(b"\n", start, end)
+    if header_end < 0:
+        return FastaRecord(buf[start + 1:end].rstrip(), buf, start, end, end, 0, base + start)
+    
+    seq_start = header_end + 1
+    length = end - seq_start - buf.count(b"\n", seq_start, end)
+    if header_end > start and buf[header_end - 1] == 13:  # quebras de linha CRLF
+        length -= buf.count(b"\r", seq_start, end)
+    
+    return FastaRecord(buf[start + 1:header_end].rstrip(), buf, start, seq_start, end, length, base + start)
+
+def _stream_long_record(
+    handle: BinaryIO,
+    buf: bytes,
+    pos: int,
+    header_end: int,
+    base: int,
+    chunk_size: int,
+    min_length: int,
+    max_length: Optional[int]
+) -> Tuple[FastaRecord, bytes, int, int]:
+    """
+    Lê um registro maior que o bloco de leitura aplicando o filtro de tamanho.
+    
+    O tamanho é obtido contando as quebras de linha de cada bloco, sem
+    concatenar os blocos. Um registro rejeitado é devolvido apenas com o
+    cabeçalho e o tamanho (a sequência é descartada à medida que é lida);
+    um registro aceito é montado com uma única cópia.
+    
+    Returns:
+        Tupla (registro, próximo bloco, offset do bloco, posição do próximo
+        registro no bloco); o próximo bloco é vazio no fim do arquivo
+    """
+    crlf = header_end > pos and buf[header_end - 1] == 13
+    segments: Optional[List] = [memoryview(buf)[pos:]]
+    size = len(buf) - header_end - 1
+    breaks = buf.count(b"\n", header_end + 1)
+    if crlf:
+        breaks += buf.count(b"\r", header_end + 1)
+    previous = buf[-1]
+    chunk_base = base + len(buf)
+    
+    while True:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            boundary = 0
+            break
+        boundary = chunk.find(b">")
+        while boundary >= 0 and (chunk[boundary - 1] if boundary else previous) != 10:
+            boundary = chunk.find(b">", boundary + 1)
+        end = boundary if boundary >= 0 else len(chunk)
+        
+        size += end
+        breaks += chunk.count(b"\n", 0, end)
+        if crlf:
+            breaks += chunk.count(b"\r", 0, end)
+        if segments is not None:
+            if max_length and size - breaks > max_length:
+                segments = None  # já rejeitado: descartar os blocos lidos
+            elif end:
+                segments.append(memoryview(chunk)[:end])
+        if boundary >= 0:
+            break
+        previous = chunk[-1]
+        chunk_base += len(chunk)
+    
+    length = size - breaks
+    header = buf[pos + 1:header_end].rstrip()
+    if segments is not None and length >= min_length:
+        data = b"".join(segments)
+        record = FastaRecord(header, data, 0, header_end + 1 - pos, len(data), length, base + pos)
+    else:
+        header_line = buf[pos:header_end + 1]
+        record = FastaRecord(header, header_line, 0, len(header_line), len(header_line), length, base + pos)
+    return record, chunk, chunk_base, boundary
+
+def iter_fasta_records(
+    handle: BinaryIO,
+    chunk_size: int = READ_CHUNK_SIZE,
+    min_length: int = 0,
+    max_length: Optional[int] = None
+) -> Iterator[FastaRecord]:
+    """
+    Lê registros FASTA de um arquivo aberto em modo binário.
+    
+    O arquivo é lido em blocos grandes e os registros são delimitados
+    procurando '\\n>' diretamente nos bytes, sem decodificar nem copiar as
+    linhas de sequência. Linhas antes do primeiro '>' são ignoradas.
+    
+    Com filtro de tamanho, registros maiores que o bloco de leitura são
+    medidos pelas quebras de linha durante a leitura: os rejeitados são
+    devolvidos sem sequência (apenas cabeçalho e tamanho), sem que os seus
+    bytes sejam acumulados em memória.
+    
+    Args:
+        handle: Arquivo aberto em modo binário
+        chunk_size: Tamanho dos blocos de leitura
+        min_length: Tamanho mínimo para manter a sequência do registro
+        max_length: Tamanho máximo para manter a sequência do registro
+    
+    Yields:
+        FastaRecord para cada contig, na ordem do arquivo
+    """
+    buf = handle.read(chunk_size)
+    base = 0
+    
+    # Localizar o início do primeiro registro
+    while not buf.startswith(b">"):
+        first = buf.find(b"\n>")
+        if first >= 0:
+            buf = buf[first + 1:]
+            base += first + 1
+            break
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            return
+        base += len(buf) - 1
+        buf = buf[-1:] + chunk
+    
+    pos = 0
+    scan = 1
+    eof = False
+    length_filter = bool(min_length or max_length)
+    while True:
+        # Busca de um único byte (memchr) é bem mais rápida que a de '\n>'
+        boundary = buf.find(b">", scan)
+        while boundary > 0 and buf[boundary - 1] != 10:
+            boundary = buf.find(b">", boundary + 1)
+        if boundary >= 0:
+            boundary -= 1
+        if boundary < 0 and not eof and length_filter and len(buf) - pos >= chunk_size:
+            header_end = buf.find(b"\n", pos)
+            if header_end >= 0:
+                record, buf, base, pos = _stream_long_record(
+                    handle, buf, pos, header_end, base, chunk_size, min_length, max_length)
+                yield record
+                if not buf:
+                    return
+                scan = pos + 1
+                continue
+        if boundary < 0 and not eof:
+            # Ler pelo menos o tamanho do registro pendente, para que registros
+            # muito longos sejam montados com custo linear
+            chunk = handle.read(max(chunk_size, len(buf) - pos))
+            if chunk:
+                pending = buf[pos:]
+                base += pos
+                scan = max(len(pending) - 1, 1)
+                buf = pending + chunk
+                pos = 0
+                continue
+            eof = True
+        
+        end = boundary + 1 if boundary >= 0 else len(buf)
+        yield make_fasta_record(buf, pos, end, base)
+        if boundary < 0:
+            return
+        pos = end
+        scan = pos + 1
+
+def write_fasta_record(handle: BinaryIO, record: FastaRecord) -> None:
+    """Copia o registro para a saída exatamente como foi lido."""
+    handle.write(record.raw())
+    if record.buffer[record.seq_end - 1] != 10:
+        handle.write(b"\n")
+
+def sequence_digest_function() -> Callable[[bytes], bytes]:
+    """Hash de 128 bits das sequências: xxh3-128 se o pacote xxhash estiver instalado, senão BLAKE2b."""
+    try:
+        import xxhash
+        return xxhash.xxh3_128_digest
+    except ImportError:
+        return lambda data: hashlib.blake2b(data, digest_size=16).digest()
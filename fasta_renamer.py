@@ -13,8 +13,26 @@ import sys
 import argparse
 import logging
 import shutil
+from collections import Counter
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Set
+
+from file_scanner import directory_listing, scan_files
+from rename_journal import JOURNAL_COMMANDS, apply_renames, main_journal
+
+# Estratégias de backup (--backup-mode). auto tenta hardlink, depois
+# reflink e só copia os dados se nenhum dos dois for possível.
+BACKUP_MODES = ["copy", "hardlink", "reflink", "auto", "journal"]
+BACKUP_FALLBACKS = {
+    "copy": ["copy"],
+    "hardlink": ["hardlink", "copy"],
+    "reflink": ["reflink", "copy"],
+    "auto": ["hardlink", "reflink", "copy"],
+}
+BACKUP_JOURNAL = "nomes_originais.tsv"
+
+# ioctl do Linux que clona um arquivo inteiro (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
 
 def setup_logging(verbose: bool = False) -> None:
     """Configura o sistema de logging."""
@@ -34,14 +52,19 @@ def validate_directory(directory: str) -> Path:
         raise NotADirectoryError(f"O caminho não é um diretório: {directory}")
     return path
 
-def get_fasta_files(directory: Path, recursive: bool = False) -> List[Path]:
-    """Obtém lista de arquivos FASTA no diretório."""
-    extensions = ["*.fasta", "*.fa", "*.fas", "*.fna"]
-    files = []
+def get_fasta_files(
+    directory: Path,
+    recursive: bool = False,
+    listing: Optional[Set[Path]] = None
+) -> List[Path]:
+    """
+    Obtém lista de arquivos FASTA no diretório.
     
-    for ext in extensions:
-        pattern = f"**/{ext}" if recursive else ext
-        files.extend(directory.glob(pattern))
+    Se `listing` for informado, recebe todas as entradas das pastas
+    percorridas (usado na verificação de conflitos).
+    """
+    extensions = [".fasta", ".fa", ".fas", ".fna"]
+    files = [scanned.path for scanned in scan_files(directory, extensions, recursive, listing)]
     
     if not files:
         logging.warning(f"Nenhum arquivo FASTA encontrado em {directory}")
@@ -95,78 +118,176 @@ def generate_new_fasta_name(
     
     return new_name
 
-def check_conflicts(files: List[Path], pattern: str, custom_suffix: str = "") -> Dict[str, List[str]]:
+def check_conflicts(
+    files: List[Path],
+    pattern: str,
+    custom_suffix: str = "",
+    listing: Optional[Set[Path]] = None
+) -> Dict[str, List[str]]:
     """
     Verifica conflitos de nomes antes de renomear.
     
+    Cada pasta é um espaço de nomes próprio (modo recursivo). Um destino que
+    já existe mas também será renomeado (troca ou ciclo de nomes) não é
+    conflito: o journal passa por nomes temporários.
+    
+    Args:
+        listing: Entradas das pastas dos arquivos (da varredura); se omitido,
+            as pastas são listadas aqui, uma vez cada
+    
     Returns:
         Dicionário com conflitos encontrados
     """
+    if listing is None:
+        listing = directory_listing(file_path.parent for file_path in files)
     new_names = {}
     conflicts = {"duplicates": [], "existing": []}
+    targets = [file_path.parent / generate_new_fasta_name(file_path.name, pattern, custom_suffix)
+               for file_path in files]
+    sources = {file_path for file_path, new_path in zip(files, targets) if new_path != file_path}
     
-    for file_path in files:
-        new_name = generate_new_fasta_name(file_path.name, pattern, custom_suffix)
-        new_path = file_path.parent / new_name
-        
+    for file_path, new_path in zip(files, targets):
         # Verificar duplicatas
-        if new_name in new_names:
-            conflicts["duplicates"].append(f"{new_name}: {new_names[new_name]} e {file_path.name}")
+        if new_path in new_names:
+            conflicts["duplicates"].append(f"{new_path}: {new_names[new_path]} e {file_path}")
         else:
-            new_names[new_name] = file_path.name
+            new_names[new_path] = file_path
         
         # Verificar arquivos existentes
-        if new_path.exists() and new_path != file_path:
-            conflicts["existing"].append(f"{new_name} já existe")
+        if new_path in listing and new_path != file_path and new_path not in sources:
+            conflicts["existing"].append(f"{new_path} já existe")
     
     return conflicts
 
-def rename_file_safe(
-    old_path: Path, 
-    new_path: Path, 
-    dry_run: bool = False,
-    force: bool = False
-) -> bool:
+def reflink_file(source: Path, destination: Path) -> None:
+    """Clona o arquivo com FICLONE (cópia copy-on-write, sem gravar os dados)."""
+    import fcntl
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            destination.unlink()
+            raise
+    shutil.copystat(source, destination)
+
+def backup_file(source: Path, destination: Path, mode: str = "copy",
+                unavailable: Optional[set] = None) -> str:
     """
-    Renomeia arquivo de forma segura, verificando conflitos.
+    Faz o backup de um arquivo pela primeira estratégia possível do modo.
+    
+    Hardlinks e reflinks não gravam os dados de novo; como a renomeação não
+    altera o conteúdo, o backup continua idêntico ao original.
     
     Args:
-        old_path: Caminho original
-        new_path: Novo caminho
-        dry_run: Se True, apenas simula a operação
-        force: Sobrescrever arquivos existentes
+        unavailable: Estratégias que já falharam neste lote (o backup fica
+            sempre no mesmo sistema de arquivos); atualizado a cada falha
     
     Returns:
-        True se a operação foi bem-sucedida
+        Estratégia usada ('hardlink', 'reflink' ou 'copy')
     """
-    if new_path.exists() and new_path != old_path:
-        if not force:
-            logging.error(f"Arquivo de destino já existe: {new_path.name}")
-            return False
-        else:
-            logging.warning(f"Sobrescrevendo arquivo existente: {new_path.name}")
+    if unavailable is None:
+        unavailable = set()
+    for method in BACKUP_FALLBACKS[mode]:
+        if method in unavailable:
+            continue
+        if method == "copy":
+            shutil.copy2(source, destination)
+            return method
+        
+        if destination.exists():
+            destination.unlink()
+        try:
+            if method == "hardlink":
+                os.link(source, destination)
+            else:
+                reflink_file(source, destination)
+            return method
+        except (OSError, ImportError) as e:
+            # Sistema de arquivos sem suporte a links/clones, ou sem permissão
+            logging.info(f"{method} indisponível em {destination.parent} ({e}); usando a próxima estratégia")
+            unavailable.add(method)
+    
+    raise OSError(f"Nenhuma estratégia de backup disponível para {source}")
+
+def write_backup_journal(files: List[Path], backup_dir: Path, targets: Optional[List[Path]] = None) -> Path:
+    """
+    Grava apenas os nomes originais (backup sem cópia dos dados).
     
-    if dry_run:
-        logging.info(f"[DRY RUN] {old_path.name} → {new_path.name}")
-        return True
+    Cada linha tem o caminho original, o novo caminho (se conhecido), o
+    tamanho e o mtime, o suficiente para desfazer a renomeação.
+    """
+    journal = backup_dir / BACKUP_JOURNAL
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write("original\tnovo\ttamanho\tmtime_ns\n")
+        for index, file_path in enumerate(files):
+            stat = file_path.stat()
+            target = targets[index] if targets is not None else ""
+            f.write(f"{file_path}\t{target}\t{stat.st_size}\t{stat.st_mtime_ns}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return journal
+
+def backup_path_for(file_path: Path, backup_dir: Path, directory: Path) -> Path:
+    """Caminho do backup de um arquivo: mesma estrutura de subpastas da origem."""
+    return backup_dir / file_path.relative_to(directory)
+
+def verify_backup(files: List[Path], backup_dir: Path, mode: str, directory: Optional[Path] = None) -> bool:
+    """Confere se o backup cobre todos os arquivos antes de renomear."""
+    if directory is None:
+        directory = backup_dir.parent
+    if mode == "journal":
+        with open(backup_dir / BACKUP_JOURNAL, encoding="utf-8") as f:
+            recorded = sum(1 for _ in f) - 1
+        missing = len(files) - recorded
+    else:
+        missing = 0
+        for file_path in files:
+            backup_path = backup_path_for(file_path, backup_dir, directory)
+            if not backup_path.is_file() or backup_path.stat().st_size != file_path.stat().st_size:
+                missing += 1
     
-    try:
-        old_path.rename(new_path)
-        logging.info(f"Renomeado: {old_path.name} → {new_path.name}")
-        return True
-    except Exception as e:
-        logging.error(f"Erro ao renomear {old_path.name}: {e}")
+    if missing:
+        logging.error(f"Backup incompleto: {missing} de {len(files)} arquivos sem backup")
         return False
+    logging.info(f"Backup verificado: {len(files)} arquivos")
+    return True
 
-def create_backup(files: List[Path], backup_dir: Path) -> bool:
-    """Cria backup dos arquivos originais."""
+def create_backup(
+    files: List[Path],
+    backup_dir: Path,
+    mode: str = "copy",
+    targets: Optional[List[Path]] = None,
+    directory: Optional[Path] = None
+) -> bool:
+    """
+    Cria backup dos arquivos originais e confere o resultado.
+    
+    Args:
+        files: Arquivos que serão renomeados
+        backup_dir: Pasta do backup
+        mode: 'copy', 'hardlink', 'reflink', 'auto' ou 'journal' (só os nomes)
+        targets: Novos caminhos, na ordem de `files` (registrados no journal)
+        directory: Pasta de origem; os backups repetem as subpastas relativas
+            a ela (padrão: a pasta que contém backup_dir)
+    """
+    if directory is None:
+        directory = backup_dir.parent
     try:
         backup_dir.mkdir(exist_ok=True)
-        for file_path in files:
-            backup_path = backup_dir / file_path.name
-            shutil.copy2(file_path, backup_path)
-        logging.info(f"Backup criado em: {backup_dir}")
-        return True
+        if mode == "journal":
+            journal = write_backup_journal(files, backup_dir, targets)
+            logging.info(f"Journal de nomes criado em: {journal}")
+        else:
+            methods = Counter()
+            unavailable = set()
+            for file_path in files:
+                backup_path = backup_path_for(file_path, backup_dir, directory)
+                backup_path.parent.mkdir(parents=True, exist_ok=True)
+                methods[backup_file(file_path, backup_path, mode, unavailable)] += 1
+            summary = ", ".join(f"{method}: {count}" for method, count in methods.most_common())
+            logging.info(f"Backup criado em: {backup_dir} ({summary})")
+        return verify_backup(files, backup_dir, mode, directory)
     except Exception as e:
         logging.error(f"Erro ao criar backup: {e}")
         return False
@@ -178,7 +299,10 @@ def renomear_fasta_pasta(
     recursive: bool = False,
     dry_run: bool = False,
     backup: bool = False,
-    force: bool = False
+    force: bool = False,
+    backup_mode: str = "copy",
+    plan: Optional[str] = None,
+    jobs: int = 1
 ) -> Tuple[int, int]:
     """
     Renomeia arquivos FASTA em uma pasta.
@@ -191,6 +315,9 @@ def renomear_fasta_pasta(
         dry_run: Apenas simula as operações
         backup: Cria backup dos arquivos originais
         force: Sobrescrever arquivos existentes
+        backup_mode: Estratégia de backup (ver BACKUP_MODES)
+        plan: Arquivo do plano de renomeação (padrão: dentro da pasta)
+        jobs: Renomeações em paralelo (pool de threads, por pasta)
     
     Returns:
         Tupla (sucessos, erros)
@@ -201,13 +328,14 @@ def renomear_fasta_pasta(
         logging.error(e)
         return 0, 1
     
-    fasta_files = get_fasta_files(directory, recursive)
+    listing = set()
+    fasta_files = get_fasta_files(directory, recursive, listing)
     
     if not fasta_files:
         return 0, 0
     
     # Verificar conflitos
-    conflicts = check_conflicts(fasta_files, pattern, custom_suffix)
+    conflicts = check_conflicts(fasta_files, pattern, custom_suffix, listing)
     
     if conflicts["duplicates"]:
         logging.error("Conflitos de nomes detectados:")
@@ -225,29 +353,30 @@ def renomear_fasta_pasta(
             logging.error("Use --force para sobrescrever arquivos existentes")
             return 0, len(fasta_files)
     
+    targets = [file_path.parent / generate_new_fasta_name(file_path.name, pattern, custom_suffix)
+               for file_path in fasta_files]
+    
     # Criar backup se solicitado
     if backup and not dry_run:
         backup_dir = directory / "backup_fasta_originals"
-        if not create_backup(fasta_files, backup_dir):
+        if not create_backup(fasta_files, backup_dir, backup_mode, targets, directory):
             logging.error("Falha ao criar backup. Abortando...")
             return 0, len(fasta_files)
     
-    sucessos = 0
-    erros = 0
-    
-    for file_path in fasta_files:
-        new_name = generate_new_fasta_name(file_path.name, pattern, custom_suffix)
-        new_path = file_path.parent / new_name
-        
-        if rename_file_safe(file_path, new_path, dry_run, force):
-            sucessos += 1
-        else:
-            erros += 1
-    
-    return sucessos, erros
+    # Plano completo antigo → novo, aplicado em duas fases pelo journal
+    plan_path = Path(plan) if plan else None
+    return apply_renames(list(zip(fasta_files, targets)), "fasta", directory, dry_run, plan_path, force, listing, jobs)
 
 def main():
     """Função principal do script."""
+    if len(sys.argv) > 1 and sys.argv[1] in JOURNAL_COMMANDS:
+        sucessos, erros = main_journal(sys.argv[1], sys.argv[2:])
+        logging.info("=" * 50)
+        logging.info(f"RESUMO: {sucessos} sucessos, {erros} erros")
+        if erros > 0:
+            sys.exit(1)
+        return
+    
     parser = argparse.ArgumentParser(
         description="Renomeador inteligente de arquivos FASTA",
         epilog="""
@@ -260,7 +389,12 @@ Exemplos de uso:
   %(prog)s /caminho/para/pasta
   %(prog)s /caminho/para/pasta --pattern first_two --recursive
   %(prog)s /caminho/para/pasta --custom-suffix "_processed" --backup
+  %(prog)s /caminho/para/pasta --backup-mode auto
   %(prog)s /caminho/para/pasta --dry-run --verbose
+  %(prog)s /caminho/para/pasta --dry-run --plan plano.json
+  %(prog)s /caminho/para/pasta --recursive --jobs 16
+  %(prog)s execute plano.json
+  %(prog)s undo plano.json
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
@@ -295,6 +429,25 @@ Exemplos de uso:
         action="store_true",
         help="Cria backup dos arquivos originais"
     )
+    parser.add_argument(
+        "--backup-mode",
+        choices=BACKUP_MODES,
+        help="Estratégia de backup (implica --backup): copy (padrão), hardlink, reflink "
+             "(FICLONE), auto (hardlink, reflink ou cópia) ou journal (apenas os nomes); "
+             "hardlink e reflink recorrem à cópia quando não são suportados"
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="ARQUIVO",
+        help="Arquivo do plano de renomeação (padrão: rename_plan_fasta_<data>.json na "
+             "pasta); com --dry-run o plano é só gravado, para 'execute' depois"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Renomeações em paralelo, agrupadas por pasta; útil em NFS/Lustre (padrão: 1)"
+    )
     parser.add_argument(
         "--force", "-f",
         action="store_true",
@@ -308,6 +461,9 @@ Exemplos de uso:
     
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error("--jobs deve ser pelo menos 1")
+    
     setup_logging(args.verbose)
     
     if args.dry_run:
@@ -319,8 +475,11 @@ Exemplos de uso:
         args.custom_suffix,
         args.recursive,
         args.dry_run,
-        args.backup,
-        args.force
+        args.backup or args.backup_mode is not None,
+        args.force,
+        args.backup_mode or "copy",
+        args.plan,
+        args.jobs
     )
     
     # Resumo final
@@ -13,7 +13,10 @@ import sys
 import argparse
 import logging
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Set
+
+from file_scanner import scan_files
+from rename_journal import JOURNAL_COMMANDS, apply_renames, main_journal
 
 def setup_logging(verbose: bool = False) -> None:
     """Configura o sistema de logging."""
@@ -33,10 +36,18 @@ def validate_directory(directory: str) -> Path:
         raise NotADirectoryError(f"O caminho não é um diretório: {directory}")
     return path
 
-def get_fastq_files(directory: Path, recursive: bool = False) -> List[Path]:
-    """Obtém lista de arquivos FASTQ no diretório."""
-    pattern = "**/*.fastq.gz" if recursive else "*.fastq.gz"
-    files = list(directory.glob(pattern))
+def get_fastq_files(
+    directory: Path,
+    recursive: bool = False,
+    listing: Optional[Set[Path]] = None
+) -> List[Path]:
+    """
+    Obtém lista de arquivos FASTQ no diretório.
+    
+    Se `listing` for informado, recebe todas as entradas das pastas
+    percorridas (usado na verificação de conflitos).
+    """
+    files = [scanned.path for scanned in scan_files(directory, [".fastq.gz"], recursive, listing)]
     
     if not files:
         logging.warning(f"Nenhum arquivo .fastq.gz encontrado em {directory}")
@@ -74,40 +85,14 @@ def generate_new_name(original_name: str, pattern: str = "first_last") -> str:
     
     return new_name
 
-def rename_file_safe(old_path: Path, new_path: Path, dry_run: bool = False) -> bool:
-    """
-    Renomeia arquivo de forma segura, verificando conflitos.
-    
-    Args:
-        old_path: Caminho original
-        new_path: Novo caminho
-        dry_run: Se True, apenas simula a operação
-    
-    Returns:
-        True se a operação foi bem-sucedida
-    """
-    if new_path.exists():
-        logging.error(f"Arquivo de destino já existe: {new_path.name}")
-        return False
-    
-    if dry_run:
-        logging.info(f"[DRY RUN] {old_path.name} → {new_path.name}")
-        return True
-    
-    try:
-        old_path.rename(new_path)
-        logging.info(f"Renomeado: {old_path.name} → {new_path.name}")
-        return True
-    except Exception as e:
-        logging.error(f"Erro ao renomear {old_path.name}: {e}")
-        return False
-
 def renomear_fastq_pasta(
     pasta: str, 
     pattern: str = "first_last", 
     recursive: bool = False,
     dry_run: bool = False,
-    backup: bool = False
+    backup: bool = False,
+    plan: Optional[str] = None,
+    jobs: int = 1
 ) -> Tuple[int, int]:
     """
     Renomeia arquivos FASTQ em uma pasta.
@@ -117,7 +102,9 @@ def renomear_fastq_pasta(
         pattern: Padrão de renomeação
         recursive: Busca recursiva em subpastas
         dry_run: Apenas simula as operações
-        backup: Cria backup dos nomes originais
+        backup: Cria backup dos nomes originais (mapeamento original → novo)
+        plan: Arquivo do plano de renomeação (padrão: dentro da pasta)
+        jobs: Renomeações em paralelo (pool de threads, por pasta)
     
     Returns:
         Tupla (sucessos, erros)
@@ -128,11 +115,29 @@ def renomear_fastq_pasta(
         logging.error(e)
         return 0, 1
     
-    fastq_files = get_fastq_files(directory, recursive)
+    listing = set()
+    fastq_files = get_fastq_files(directory, recursive, listing)
     
     if not fastq_files:
         return 0, 0
     
+    # Mapeamento completo antes de qualquer renomeação, conferido contra a
+    # listagem da varredura (cada pasta é um espaço de nomes próprio). Um
+    # destino que já existe só é aceito se também for renomeado (troca ou
+    # ciclo de nomes).
+    targets = [file_path.parent / generate_new_name(file_path.name, pattern) for file_path in fastq_files]
+    sources = {file_path for file_path, new_path in zip(fastq_files, targets) if new_path != file_path}
+    renames = []
+    erros = 0
+    for file_path, new_path in zip(fastq_files, targets):
+        if new_path == file_path:
+            continue
+        if new_path in listing and new_path not in sources:
+            logging.error(f"Arquivo de destino já existe: {new_path}")
+            erros += 1
+            continue
+        renames.append((file_path, new_path))
+    
     # Criar backup dos nomes originais se solicitado
     if backup and not dry_run:
         backup_file = directory / "backup_original_names.txt"
@@ -140,26 +145,25 @@ def renomear_fastq_pasta(
             f.write("# Backup dos nomes originais\n")
             f.write("# Data: " + str(logging.Formatter().formatTime(logging.LogRecord(
                 '', '', '', '', '', '', '', ''))) + "\n")
-            for file_path in fastq_files:
-                f.write(f"{file_path.name}\n")
+            f.write("# original\tnovo\n")
+            for file_path, new_path in renames:
+                f.write(f"{file_path.relative_to(directory)}\t{new_path.relative_to(directory)}\n")
         logging.info(f"Backup criado: {backup_file}")
     
-    sucessos = 0
-    erros = 0
-    
-    for file_path in fastq_files:
-        new_name = generate_new_name(file_path.name, pattern)
-        new_path = file_path.parent / new_name
-        
-        if rename_file_safe(file_path, new_path, dry_run):
-            sucessos += 1
-        else:
-            erros += 1
-    
-    return sucessos, erros
+    plan_path = Path(plan) if plan else None
+    sucessos, plan_erros = apply_renames(renames, "fastq", directory, dry_run, plan_path, listing=listing, jobs=jobs)
+    return sucessos, erros + plan_erros
 
 def main():
     """Função principal do script."""
+    if len(sys.argv) > 1 and sys.argv[1] in JOURNAL_COMMANDS:
+        sucessos, erros = main_journal(sys.argv[1], sys.argv[2:])
+        logging.info("=" * 50)
+        logging.info(f"RESUMO: {sucessos} sucessos, {erros} erros")
+        if erros > 0:
+            sys.exit(1)
+        return
+    
     parser = argparse.ArgumentParser(
         description="Renomeia arquivos FASTQ de forma inteligente",
         epilog="""
@@ -167,6 +171,10 @@ Exemplos de uso:
   %(prog)s /caminho/para/pasta
   %(prog)s /caminho/para/pasta --pattern first_only --recursive
   %(prog)s /caminho/para/pasta --dry-run --verbose
+  %(prog)s /caminho/para/pasta --dry-run --plan plano.json
+  %(prog)s /caminho/para/pasta --recursive --jobs 16
+  %(prog)s execute plano.json
+  %(prog)s undo plano.json
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
@@ -196,6 +204,18 @@ Exemplos de uso:
         action="store_true",
         help="Cria backup dos nomes originais"
     )
+    parser.add_argument(
+        "--plan",
+        metavar="ARQUIVO",
+        help="Arquivo do plano de renomeação (padrão: rename_plan_fastq_<data>.json na "
+             "pasta); com --dry-run o plano é só gravado, para 'execute' depois"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Renomeações em paralelo, agrupadas por pasta; útil em NFS/Lustre (padrão: 1)"
+    )
     parser.add_argument(
         "--verbose", "-v",
         action="store_true",
@@ -204,6 +224,9 @@ Exemplos de uso:
     
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error("--jobs deve ser pelo menos 1")
+    
     setup_logging(args.verbose)
     
     if args.dry_run:
@@ -214,7 +237,9 @@ Exemplos de uso:
         args.pattern,
         args.recursive,
         args.dry_run,
-        args.backup
+        args.backup,
+        args.plan,
+        args.jobs
     )
     
     # Resumo final
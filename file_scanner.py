@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Varredura de diretórios compartilhada pelos renomeadores e preparadores
+Percorre a pasta uma única vez com os.scandir, casando todas as extensões
+na mesma passada, em vez de um glob por extensão. O stat de cada arquivo
+fica em cache no DirEntry, então quem precisa de tamanho ou mtime não
+consulta o sistema de arquivos de novo (importante em NFS).
+
+Autor: Felipe Lei
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Set
+
+class ScannedFile(NamedTuple):
+    """Arquivo encontrado na varredura."""
+    path: Path
+    entry: os.DirEntry
+    
+    @property
+    def name(self) -> str:
+        return self.entry.name
+    
+    def stat(self) -> os.stat_result:
+        """stat do arquivo; a consulta é feita uma vez e reaproveitada."""
+        return self.entry.stat()
+
+def scan_files(
+    directory: Path,
+    extensions: Iterable[str],
+    recursive: bool = False,
+    listing: Optional[Set[Path]] = None
+) -> List[ScannedFile]:
+    """
+    Lista os arquivos da pasta cujo nome termina em uma das extensões.
+    
+    Links simbólicos para arquivos são incluídos; links para pastas não são
+    seguidos na busca recursiva (evita ciclos). Subpastas sem permissão de
+    leitura são ignoradas.
+    
+    Args:
+        directory: Pasta a percorrer
+        extensions: Extensões aceitas, com o ponto (ex.: ".fastq.gz")
+        recursive: Percorre também as subpastas
+        listing: Se informado, recebe o caminho de todas as entradas das
+            pastas percorridas (inclusive as que não casam), para verificar
+            conflitos de nomes sem consultar o disco de novo
+    
+    Returns:
+        Arquivos encontrados, ordenados pelo caminho
+    """
+    suffixes = tuple(extensions)
+    files = []
+    pending = [directory]
+    
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if listing is not None:
+                        listing.add(current / entry.name)
+                    if entry.name.endswith(suffixes) and entry.is_file():
+                        files.append(ScannedFile(current / entry.name, entry))
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        pending.append(current / entry.name)
+        except PermissionError:
+            if current == directory:
+                raise
+            continue
+    
+    files.sort(key=lambda scanned: scanned.path)
+    return files
+
+def directory_listing(directories: Iterable[Path]) -> Set[Path]:
+    """Caminhos de todas as entradas das pastas, com um scandir por pasta."""
+    listing = set()
+    for directory in set(directories):
+        try:
+            with os.scandir(directory) as entries:
+                listing.update(directory / entry.name for entry in entries)
+        except FileNotFoundError:
+            continue
+    return listing
@@ -7,31 +7,537 @@ Description: Creates multiFASTA files with automatic source tracking by incorpor
 """
 
 import argparse
+import hashlib
+import heapq
+import io
+import json
 import os
+import pickle
+import shutil
+import sqlite3
+import string
 import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
-import gzip
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 import logging
 
+from fasta_io import (
+    COMPRESSION_CHOICES, NON_GC_BYTES, FastaRecord, append_file, compressed_name, copy_range,
+    iter_fasta_records, open_input, open_output, sequence_digest_function, sync_output
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Standard FASTA line width for output sequences
+LINE_WIDTH = 80
+
+# Name of the merged output and of its incremental-merge manifest
+MERGED_NAME = 'merged_multifasta.fasta'
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Source-tracking index (--index): SQLite for these suffixes, TSV otherwise
+SQLITE_SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+INDEX_COLUMNS = ('header', 'source', 'original', 'contig', 'offset', 'length')
+
+# Batch checkpoints (--resume): file in the output directory, saved at most
+# once per interval (seconds)
+CHECKPOINT_NAME = '.multifasta_checkpoint.json'
+CHECKPOINT_INTERVAL = 30.0
+
+# Length-sorted merge (--sort-length): records held in memory per sorted
+# run, and runs merged at once (open files)
+SORT_BUFFER_SIZE = 256 * 1024 * 1024
+SORT_MERGE_FANIN = 64
+
+# Whitespace that strip() would remove from sequence lines, besides '\n'
+SEQUENCE_WHITESPACE = (b" ", b"\t", b"\r", b"\x0b", b"\x0c")
+
+# Sequence normalization (--normalize): one translate() call upper-cases
+# the block and deletes all whitespace; a second one deletes the valid
+# IUPAC symbols, leaving only the invalid characters
+UPPERCASE_TABLE = bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+WHITESPACE_BYTES = b" \t\r\n\x0b\x0c"
+IUPAC_BYTES = b"ACGTURYSWKMBDHVN-"
+
+
+def is_clean_sequence(record: FastaRecord) -> bool:
+    """True if the sequence lines contain no whitespace other than line feeds."""
+    buf, start, end = record.buffer, record.seq_start, record.seq_end
+    return not any(buf.find(char, start, end) >= 0 for char in SEQUENCE_WHITESPACE)
+
+
+def sequence_bytes(record: FastaRecord, clean: bool) -> bytes:
+    """Sequence with every line stripped and the lines joined."""
+    block = record.buffer[record.seq_start:record.seq_end]
+    if clean:
+        return block.translate(None, b"\n")
+    return b"".join(line.strip() for line in block.split(b"\n"))
+
+
+def normalize_sequence(record: FastaRecord) -> bytes:
+    """Sequence upper-cased, with all whitespace and line breaks removed."""
+    return record.buffer[record.seq_start:record.seq_end].translate(UPPERCASE_TABLE, WHITESPACE_BYTES)
+
+
+def invalid_characters(sequence: bytes) -> bytes:
+    """Characters of a normalized sequence that are not IUPAC symbols."""
+    return sequence.translate(None, IUPAC_BYTES)
+
+
+def line_width(record: FastaRecord) -> Optional[int]:
+    """
+    Width of the sequence lines if the record is wrapped consistently.
+    
+    Consistent means every line but the last has the same width, the last
+    line is not longer and there are no blank lines. Only meaningful for
+    clean records (see is_clean_sequence).
+    
+    Returns:
+        The line width, or None if the wrapping is not consistent
+    """
+    buf, start, end = record.buffer, record.seq_start, record.seq_end
+    if start == end:
+        return None
+    
+    first_break = buf.find(b"\n", start, end)
+    width = (first_break if first_break >= 0 else end) - start
+    if width == 0:
+        return None
+    
+    # Clean records have no '\r', so the parser's length excludes only '\n'
+    length = record.length
+    breaks = end - start - length
+    lines = -(-length // width)
+    if breaks != (lines if buf[end - 1] == 10 else lines - 1):
+        return None
+    
+    # The break after every full line must be exactly width + 1 bytes apart
+    stride = buf[start + width:end:width + 1]
+    if len(stride) != min(length // width, breaks) or stride.count(b"\n") != len(stride):
+        return None
+    return width
+
+
+class HeaderTemplate:
+    """
+    Header format string parsed once into literal and field parts.
+    
+    The template is parsed a single time with string.Formatter, instead of
+    re-parsing it with str.format() for every contig; rendering only joins
+    the literals with format(value, spec) for each field. Only the known
+    fields are accepted; format specs such as {num:04d} and conversions
+    such as {original!r} work as in str.format().
+    
+    Fields:
+        filename      Prefix taken from the file name (or --prefix)
+        num           Contig number within the file, starting at 1
+        original      Original header
+        length        Sequence length
+        gc            GC content in percent (2 decimals unless a spec is given)
+        sample_index  Position of the input file in the batch, starting at 1
+    """
+    
+    FIELDS = ('filename', 'num', 'original', 'length', 'gc', 'sample_index')
+    CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+    DEFAULT_SPECS = {'gc': '.2f'}
+    
+    def __init__(self, template: str):
+        self.template = template
+        self.fields = set()
+        # (literal, field position, conversion, spec); a trailing literal has no field
+        self.parts: List[Tuple[str, Optional[int], Optional[Callable], str]] = []
+        
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if field is None:
+                self.parts.append((literal, None, None, ''))
+                continue
+            if field not in self.FIELDS:
+                raise ValueError(f"Unknown header field {{{field}}} in format "
+                                 f"(available: {', '.join(self.FIELDS)})")
+            if conversion is not None and conversion not in self.CONVERSIONS:
+                raise ValueError(f"Unknown conversion !{conversion} for {{{field}}} "
+                                 f"(available: !r, !s, !a)")
+            if '{' in spec or '}' in spec:
+                raise ValueError(f"Nested format specs are not supported for {{{field}}}: {spec}")
+            if not spec and conversion is None:
+                spec = self.DEFAULT_SPECS.get(field, '')
+            self.fields.add(field)
+            self.parts.append((literal, self.FIELDS.index(field),
+                               self.CONVERSIONS.get(conversion), spec))
+        
+        self.needs_gc = 'gc' in self.fields
+        
+        # Fail on bad format specs now rather than on the first contig
+        self.render('sample', 1, 'contig', 0, 0.0, 1)
+    
+    def render(self, *values) -> str:
+        """Render a header; values are given in FIELDS order."""
+        pieces = []
+        for literal, index, conversion, spec in self.parts:
+            pieces.append(literal)
+            if index is not None:
+                value = values[index]
+                if conversion is not None:
+                    value = conversion(value)
+                pieces.append(format(value, spec))
+        return ''.join(pieces)
+
+class OutputRecord(NamedTuple):
+    """A record as it will be written: new header and sequence layout."""
+    record: FastaRecord
+    num: int
+    original: str
+    header: str
+    copy_block: bool
+    sequence: Optional[bytes]
+    length: int
+
+
+class LengthSorter:
+    """
+    External merge sort of FASTA records by sequence length (longest first).
+    
+    Records are buffered up to `buffer_size` bytes, sorted and written to a
+    run file in `work_dir`; the runs are then merged with heapq.merge,
+    SORT_MERGE_FANIN at a time, so the data can be larger than memory.
+    Sorting is stable: records of the same length keep their input order.
+    Each record carries an opaque item (its index data) through the sort.
+    """
+    
+    def __init__(self, work_dir: Path, buffer_size: int = SORT_BUFFER_SIZE):
+        self.work_dir = work_dir
+        self.buffer_size = buffer_size
+        self.buffer: List[Tuple[int, bytes, object]] = []
+        self.buffered = 0
+        self.runs: List[Path] = []
+        self.run_count = 0
+    
+    def add(self, length: int, record: bytes, item: object = None) -> None:
+        """Add one record (raw bytes, ending in a newline)."""
+        self.buffer.append((-length, record, item))
+        self.buffered += len(record)
+        if self.buffered >= self.buffer_size:
+            self._write_run(self.buffer)
+    
+    def _write_run(self, entries) -> None:
+        if isinstance(entries, list):
+            entries.sort(key=lambda entry: entry[0])
+        path = self.work_dir / f"run{self.run_count:06d}"
+        self.run_count += 1
+        with open(path, 'wb') as f:
+            for entry in entries:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+        self.buffered = 0
+    
+    @staticmethod
+    def _read_run(path: Path) -> Iterator[Tuple[int, bytes, object]]:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    
+    def _merge(self, runs: List[Path]) -> Iterator[Tuple[int, bytes, object]]:
+        # heapq.merge is stable across its inputs, and the runs are in input order
+        return heapq.merge(*(self._read_run(path) for path in runs), key=lambda entry: entry[0])
+    
+    def sorted_records(self) -> Iterator[Tuple[bytes, object]]:
+        """All records, longest first, as (record bytes, item)."""
+        if not self.runs:
+            self.buffer.sort(key=lambda entry: entry[0])
+            entries = iter(self.buffer)
+        else:
+            if self.buffer:
+                self._write_run(self.buffer)
+            # Merge consecutive groups of runs until one merge pass is enough
+            while len(self.runs) > SORT_MERGE_FANIN:
+                runs, self.runs = self.runs, []
+                for start in range(0, len(runs), SORT_MERGE_FANIN):
+                    group = runs[start:start + SORT_MERGE_FANIN]
+                    self._write_run(self._merge(group))
+                    for path in group:
+                        path.unlink()
+            entries = self._merge(self.runs)
+        for _, record, item in entries:
+            yield record, item
+
+
+def file_digest(path: Path) -> str:
+    """BLAKE2b (128-bit) hash of the raw file content, as hex."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: Path, output_path: Path, settings: dict) -> Dict[str, dict]:
+    """
+    Load the inputs recorded by the last incremental merge.
+    
+    The manifest is ignored (empty result) if it is missing or unreadable,
+    if the merged file changed since it was written, or if it was written
+    with different settings.
+    
+    Returns:
+        Manifest entries by resolved input path
+    """
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        stat = output_path.stat()
+    except (OSError, ValueError):
+        return {}
+    
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('settings') != settings:
+        logger.info("Manifest settings changed; rebuilding the merged file")
+        return {}
+    if manifest.get('output_size') != stat.st_size or manifest.get('output_mtime_ns') != stat.st_mtime_ns:
+        logger.info("Merged file changed since the last run; rebuilding it")
+        return {}
+    return {entry['path']: entry for entry in manifest.get('inputs', [])}
+
+
+class SourceIndex:
+    """
+    Sidecar index of a merged output: one row per contig.
+    
+    Each row maps the new header to the source file, the original header,
+    the contig number in the source, and the byte offset and length of the
+    whole record (header line included) in the merged output. Offsets are
+    positions in the uncompressed stream.
+    
+    Rows are added one input at a time, with offsets relative to the start
+    of that input's records; the index keeps the running position in the
+    merged output. The format is chosen by the file extension: SQLite for
+    .sqlite/.sqlite3/.db (table 'contigs', indexed by header), TSV for any
+    other. The file is written under a temporary name and moved in place
+    by close().
+    
+    An index saved with checkpoint() can be reopened from that state (the
+    rows added after it are dropped) to resume an interrupted batch.
+    """
+    
+    def __init__(self, path: Path, state: Optional[dict] = None):
+        self.path = Path(path)
+        self.tmp_path = self.temporary_path(self.path)
+        self.position = 0
+        self.rows = 0
+        self.sqlite = self.path.suffix.lower() in SQLITE_SUFFIXES
+        # Set once a checkpoint refers to the temporary file
+        self.checkpointed = state is not None
+        
+        if state is not None:
+            self.position = state['position']
+            self.rows = state['rows']
+            if self.sqlite:
+                self.db = sqlite3.connect(self.tmp_path)
+                self.db.execute("DELETE FROM contigs WHERE rowid > ?", (self.rows,))
+            else:
+                os.truncate(self.tmp_path, state['size'])
+                self.out = open(self.tmp_path, 'a')
+            return
+        
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+        if self.sqlite:
+            self.db = sqlite3.connect(self.tmp_path)
+            self.db.execute("CREATE TABLE contigs (header TEXT, source TEXT, original TEXT, "
+                            "contig INTEGER, offset INTEGER, length INTEGER)")
+        else:
+            self.out = open(self.tmp_path, 'w')
+            self.out.write("\t".join(INDEX_COLUMNS) + "\n")
+    
+    @staticmethod
+    def temporary_path(path: Path) -> Path:
+        """File the index is written to until close()."""
+        return path.with_name(f".{path.name}.tmp")
+    
+    def add(self, source: str, records: List[Tuple[str, str, int, int, int]]) -> None:
+        """
+        Add the records of one input, in output order.
+        
+        Args:
+            source: Source file
+            records: Tuples (header, original, contig, relative offset, length)
+        """
+        if not records:
+            return
+        base = self.position
+        rows = [(header, source, original, contig, base + offset, length)
+                for header, original, contig, offset, length in records]
+        if self.sqlite:
+            self.db.executemany("INSERT INTO contigs VALUES (?, ?, ?, ?, ?, ?)", rows)
+        else:
+            self.out.writelines("\t".join(map(str, row)) + "\n" for row in rows)
+        offset, length = records[-1][3:]
+        self.position = base + offset + length
+        self.rows += len(rows)
+    
+    def checkpoint(self) -> dict:
+        """Commit the rows added so far to disk and return the index state."""
+        if self.sqlite:
+            self.db.commit()
+            state = {}
+        else:
+            self.out.flush()
+            os.fsync(self.out.fileno())
+            state = {'size': self.out.tell()}
+        state.update(position=self.position, rows=self.rows)
+        self.checkpointed = True
+        return state
+    
+    def close(self) -> None:
+        """Finish the index and move it to its final name."""
+        if self.sqlite:
+            self.db.execute("CREATE INDEX contigs_header ON contigs (header)")
+            self.db.commit()
+            self.db.close()
+        else:
+            self.out.close()
+        os.replace(self.tmp_path, self.path)
+        logger.info(f"Index: {self.path} ({self.rows} contigs)")
+    
+    def discard(self) -> None:
+        """Drop a partial index after an error (kept if a checkpoint refers to it)."""
+        if self.sqlite:
+            self.db.close()
+        else:
+            self.out.close()
+        if not self.checkpointed and self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+
+class BatchCheckpoint:
+    """
+    Progress of a batch run, saved periodically so that --resume can
+    continue an interrupted run.
+    
+    The saved state records how many inputs (in input order) are complete,
+    the size of the merged output at that point (synced to disk first), the
+    counters and the index state. It is tied to one batch by a digest of the
+    settings and of the inputs' paths, sizes and mtimes, and is removed once
+    the batch finishes.
+    """
+    
+    def __init__(self, output_dir: Path, batch: str, interval: float = CHECKPOINT_INTERVAL):
+        self.path = output_dir / CHECKPOINT_NAME
+        self.batch = batch
+        self.interval = interval
+        self.last_save = time.monotonic()
+    
+    def load(self) -> Optional[dict]:
+        """Saved state, or None if there is none for this batch."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('batch') != self.batch:
+            logger.warning("Checkpoint belongs to a different batch or settings; ignoring it")
+            return None
+        return state
+    
+    def due(self) -> bool:
+        """True when the last save is older than the interval."""
+        return time.monotonic() - self.last_save >= self.interval
+    
+    def save(self, state: dict) -> None:
+        """Write the state atomically (temp file, fsync, rename)."""
+        state = dict(state, batch=self.batch)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+        logger.debug(f"Checkpoint: {state['completed']} input(s) complete")
+    
+    def remove(self) -> None:
+        """Delete the checkpoint (batch finished, or starting over)."""
+        if self.path.exists():
+            self.path.unlink()
+
 
 class MultiFastaGenerator:
     """Generate MultiFASTA files with source tracking capabilities."""
     
-    def __init__(self, prefix_format: str = "{filename}_contig{num}_{original}"):
+    def __init__(self, prefix_format: str = "{filename}_contig{num}_{original}",
+                 compress: Optional[str] = None, compress_threads: int = 1,
+                 passthrough: bool = False, normalize: bool = False):
         """
         Initialize the generator with a specific header format.
         
         Args:
             prefix_format: Format string for the new headers
+            compress: Output compression ('gz', 'bgzf', 'zst') or None
+            compress_threads: Threads used to compress output blocks
+            passthrough: Keep the input line wrapping when it is consistent
+                (only headers are rewritten)
+            normalize: Upper-case sequences, remove whitespace and count
+                non-IUPAC characters
         """
         self.prefix_format = prefix_format
+        self.passthrough = passthrough
+        self.normalize = normalize
+        self.template = HeaderTemplate(prefix_format)
+        self.compress = compress
+        self.compress_threads = compress_threads
         self.processed_files = 0
         self.total_contigs = 0
+        self.invalid_characters: Dict[str, Counter] = {}
+        # Cross-sample deduplication plan: sample index -> contig number ->
+        # sources appended to the header, or None if the contig is dropped
+        self.duplicates: Optional[Dict[int, Dict[int, Optional[str]]]] = None
+        self.duplicate_contigs = 0
+    
+    def iter_records(self, filepath: Path) -> Iterator[FastaRecord]:
+        """
+        Stream the records of a FASTA file as raw byte records.
+        
+        The file is read in large blocks and records point into those blocks,
+        so sequence data is not copied. Compressed input (gzip, BGZF, zstd)
+        is detected from the file content. Records with an empty header are
+        skipped.
+        
+        Args:
+            filepath: Path to the FASTA file
+            
+        Yields:
+            FastaRecord for each contig
+        """
+        with open_input(filepath) as f:
+            for record in iter_fasta_records(f):
+                if record.header:
+                    yield record
+    
+    def iter_fasta(self, filepath: Path) -> Iterator[Tuple[str, bytes]]:
+        """
+        Stream (header, sequence) pairs from a FASTA file, one record at a time.
+        
+        Args:
+            filepath: Path to the FASTA file
+            
+        Yields:
+            Tuples of (header, sequence bytes)
+        """
+        for record in self.iter_records(filepath):
+            if self.normalize:
+                yield record.header.decode(), normalize_sequence(record)
+            else:
+                yield record.header.decode(), sequence_bytes(record, is_clean_sequence(record))
     
     def read_fasta(self, filepath: Path) -> List[Tuple[str, str]]:
         """
@@ -43,39 +549,252 @@ class MultiFastaGenerator:
         Returns:
             List of tuples containing (header, sequence)
         """
-        sequences = []
-        current_header = None
-        current_seq = []
+        try:
+            return [(header, sequence.decode()) for header, sequence in self.iter_fasta(filepath)]
+        except Exception as e:
+            logger.error(f"Error reading file {filepath}: {e}")
+            return []
+    
+    def get_prefix(self, filepath: Path, custom_prefix: str = None) -> str:
+        """Prefix used in the new headers: custom prefix or the file name."""
+        if custom_prefix:
+            return custom_prefix
+        return filepath.stem.replace('.fasta', '').replace('.fa', '').replace('.fna', '')
+    
+    def iter_output(self, filepath: Path, custom_prefix: str = None, sample_index: int = 1,
+                    invalid: Optional[Counter] = None) -> Iterator[OutputRecord]:
+        """
+        Stream the records of one FASTA file with their new headers and layout.
+        
+        Args:
+            filepath: Path to the FASTA file
+            custom_prefix: Custom prefix to use instead of filename
+            sample_index: Position of the file in the batch ({sample_index})
+            invalid: Counter updated with non-IUPAC characters (normalize mode)
+            
+        Yields:
+            OutputRecord for each contig
+        """
+        prefix = self.get_prefix(filepath, custom_prefix)
+        render = self.template.render
+        needs_gc = self.template.needs_gc
+        needs_sequence = needs_gc or 'length' in self.template.fields
+        contig_num = 0
+        
+        for record in self.iter_records(filepath):
+            contig_num += 1
+            
+            if self.normalize:
+                # Normalized sequences are always rewrapped
+                copy_block = False
+                sequence = normalize_sequence(record)
+                bad = invalid_characters(sequence)
+                if bad and invalid is not None:
+                    invalid.update(bad)
+            else:
+                copy_block, sequence = self._layout(record, is_clean_sequence(record), needs_sequence)
+            
+            length = len(sequence) if sequence is not None else record.length
+            gc = None
+            if needs_gc:
+                bases = sequence if sequence is not None else record.buffer[record.seq_start:record.seq_end]
+                gc = round(100 * len(bases.translate(None, NON_GC_BYTES)) / length, 2) if length else 0.0
+            
+            # Create new header with source tracking
+            original = record.header.decode()
+            new_header = render(prefix, contig_num, original, length, gc, sample_index)
+            yield OutputRecord(record, contig_num, original, new_header, copy_block, sequence, length)
+    
+    def write_records(self, filepath: Path, out: BinaryIO, custom_prefix: str = None,
+                      sample_index: int = 1, invalid: Optional[Counter] = None,
+                      records: Optional[list] = None) -> int:
+        """
+        Stream the records of one FASTA file to an open output, with new headers.
+        
+        With cross-sample deduplication (see find_duplicates), duplicated
+        sequences are written only once, under their first header followed
+        by the list of all sources.
+        
+        Args:
+            filepath: Path to the FASTA file
+            out: Binary output stream
+            custom_prefix: Custom prefix to use instead of filename
+            sample_index: Position of the file in the batch ({sample_index})
+            invalid: Counter updated with non-IUPAC characters (normalize mode)
+            records: List extended with (header, original, contig, offset, length)
+                of every record written; offsets start at 0 for this file
+            
+        Returns:
+            Number of contigs written
+        """
+        duplicates = self.duplicates.get(sample_index) if self.duplicates is not None else None
+        written = 0
+        position = 0
         
-        # Handle gzipped files
-        if filepath.suffix == '.gz':
-            open_func = gzip.open
-            mode = 'rt'
+        for item in self.iter_output(filepath, custom_prefix, sample_index, invalid):
+            record, length, sequence = item.record, item.length, item.sequence
+            new_header = item.header
+            if duplicates is not None and item.num in duplicates:
+                sources = duplicates[item.num]
+                if sources is None:
+                    # Written with an earlier input
+                    continue
+                new_header += sources
+            
+            header_line = b">" + new_header.encode() + b"\n"
+            out.write(header_line)
+            size = len(header_line)
+            
+            if item.copy_block:
+                out.write(record.sequence_view())
+                size += record.seq_end - record.seq_start
+                if record.buffer[record.seq_end - 1] != 10:
+                    out.write(b"\n")
+                    size += 1
+            elif sequence:
+                # Sequence in lines of 80 characters (standard FASTA width)
+                out.write(b"\n".join(sequence[i:i + LINE_WIDTH]
+                                     for i in range(0, len(sequence), LINE_WIDTH)))
+                out.write(b"\n")
+                size += length + -(-length // LINE_WIDTH)
+            
+            if records is not None:
+                records.append((new_header, item.original, item.num, position, size))
+            position += size
+            written += 1
+        
+        return written
+    
+    def sequence_digests(self, filepath: Path, custom_prefix: str = None,
+                         sample_index: int = 1) -> List[Tuple[int, bytes, str]]:
+        """
+        Hash the sequences of one FASTA file as they would be written.
+        
+        Returns:
+            List of (contig number, sequence digest, new header ID); empty if
+            the file could not be read
+        """
+        digest = sequence_digest_function()
+        digests = []
+        try:
+            for item in self.iter_output(filepath, custom_prefix, sample_index):
+                # Blocks are only copied from clean records
+                sequence = item.sequence if item.sequence is not None else sequence_bytes(item.record, True)
+                record_id = item.header.split(maxsplit=1)[0] if item.header.strip() else item.header
+                digests.append((item.num, digest(sequence), record_id))
+        except Exception as e:
+            logger.error(f"Error reading file {filepath}: {e}")
+            return []
+        return digests
+    
+    def find_duplicates(self, filepaths: List[Path], custom_prefix: str = None, jobs: int = 1) -> None:
+        """
+        First pass of cross-sample deduplication: find identical sequences.
+        
+        Every sequence is hashed (128 bits, see sequence_digest_function) and
+        looked up in an in-memory hash index. The first occurrence of a
+        duplicated sequence is kept and its header gets
+        " copies=N sources=ID1,ID2,..." (IDs of all its new headers, in
+        input order); the other occurrences are dropped. The result is
+        stored in self.duplicates for write_records.
+        """
+        if jobs > 1 and len(filepaths) > 1:
+            tasks = [(self.prefix_format, self.passthrough, self.normalize, filepath, custom_prefix, sample_index)
+                     for sample_index, filepath in enumerate(filepaths, 1)]
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(_sequence_digests_task, tasks, chunksize=max(1, len(tasks) // (jobs * 8)))
         else:
-            open_func = open
-            mode = 'r'
+            executor = None
+            results = (self.sequence_digests(filepath, custom_prefix, sample_index)
+                       for sample_index, filepath in enumerate(filepaths, 1))
         
+        # digest -> (sample index, contig number, IDs of all copies)
+        seen: Dict[bytes, Tuple[int, int, List[str]]] = {}
+        duplicates: Dict[int, Dict[int, Optional[str]]] = {}
         try:
-            with open_func(filepath, mode) as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith('>'):
-                        if current_header:
-                            sequences.append((current_header, ''.join(current_seq)))
-                        current_header = line[1:]  # Remove '>'
-                        current_seq = []
+            for sample_index, digests in enumerate(results, 1):
+                for num, key, record_id in digests:
+                    first = seen.get(key)
+                    if first is None:
+                        seen[key] = (sample_index, num, [record_id])
                     else:
-                        current_seq.append(line)
-                
-                # Don't forget the last sequence
-                if current_header:
-                    sequences.append((current_header, ''.join(current_seq)))
-                    
+                        first[2].append(record_id)
+                        duplicates.setdefault(sample_index, {})[num] = None
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        for sample_index, num, ids in seen.values():
+            if len(ids) > 1:
+                duplicates.setdefault(sample_index, {})[num] = f" copies={len(ids)} sources={','.join(ids)}"
+        
+        self.duplicates = duplicates
+        self.duplicate_contigs = sum(sources is None for nums in duplicates.values() for sources in nums.values())
+        logger.info(f"Deduplication: {len(seen)} unique sequences, "
+                    f"{self.duplicate_contigs} duplicate contigs collapsed")
+    
+    def _layout(self, record: FastaRecord, clean: bool, needs_sequence: bool) -> Tuple[bool, Optional[bytes]]:
+        """
+        Decide whether the sequence block can be copied as it is.
+        
+        Returns:
+            Tuple (copy block, sequence bytes or None when not needed)
+        """
+        # Sequence lines already laid out as they would be written are
+        # copied as one block, straight from the read buffer
+        copy_block = False
+        if clean:
+            width = line_width(record)
+            if width is not None:
+                single_line = record.length <= width
+                copy_block = (self.passthrough or width == LINE_WIDTH
+                              or (single_line and width < LINE_WIDTH))
+        
+        sequence = None
+        if not copy_block or (needs_sequence and not clean):
+            sequence = sequence_bytes(record, clean)
+        return copy_block, sequence
+    
+    def append_file(self, filepath: Path, out: BinaryIO, custom_prefix: str = None,
+                    sample_index: int = 1, records: Optional[list] = None) -> int:
+        """
+        Append one input to an output, leaving the output unchanged on error.
+        
+        Uncompressed outputs are rolled back by truncating to the position
+        before the file; compressed outputs cannot be truncated, so the
+        records of each input are staged in memory (one input at a time).
+        If given, `records` is filled as in write_records (left empty on error).
+        
+        Returns:
+            Number of contigs written (0 if the file could not be read)
+        """
+        staged = self.compress is not None
+        target = io.BytesIO() if staged else out
+        start = None if staged else out.tell()
+        invalid = Counter()
+        
+        try:
+            count = self.write_records(filepath, target, custom_prefix, sample_index, invalid, records)
         except Exception as e:
             logger.error(f"Error reading file {filepath}: {e}")
-            return []
+            if records is not None:
+                records.clear()
+            if not staged:
+                out.seek(start)
+                out.truncate()
+            return 0
         
-        return sequences
+        if staged:
+            out.write(target.getbuffer())
+        if count:
+            self.processed_files += 1
+            self.total_contigs += count
+            logger.info(f"Processed {filepath.name}: {count} contigs")
+        if invalid:
+            self.invalid_characters[str(filepath)] = invalid
+            shown = ", ".join(f"{chr(char)!r}: {n}" for char, n in invalid.most_common(5))
+            logger.warning(f"{filepath.name}: {sum(invalid.values())} non-IUPAC characters ({shown})")
+        return count
     
     def process_single_file(self, filepath: Path, custom_prefix: str = None) -> str:
         """
@@ -88,40 +807,475 @@ class MultiFastaGenerator:
         Returns:
             Processed FASTA content as string
         """
-        sequences = self.read_fasta(filepath)
-        if not sequences:
+        buffer = io.BytesIO()
+        try:
+            count = self.write_records(filepath, buffer, custom_prefix)
+        except Exception as e:
+            logger.error(f"Error reading file {filepath}: {e}")
+            return ""
+        if not count:
             return ""
         
-        # Get prefix from filename or use custom prefix
-        if custom_prefix:
-            prefix = custom_prefix
+        self.processed_files += 1
+        self.total_contigs += count
+        logger.info(f"Processed {filepath.name}: {count} contigs")
+        
+        return buffer.getvalue().decode().rstrip('\n')
+    
+    def write_file(self, filepath: Path, output_path: Path, custom_prefix: str = None,
+                   sample_index: int = 1, records: Optional[list] = None) -> int:
+        """
+        Write one input to its own output file (removed if nothing was written).
+        
+        Returns:
+            Number of contigs written
+        """
+        with open_output(output_path, self.compress, self.compress_threads) as out:
+            count = self.append_file(filepath, out, custom_prefix, sample_index, records)
+        if not count:
+            output_path.unlink()
+        return count
+    
+    def write_batch(self, filepaths: List[Path], output_dir: Path, merge: bool = False,
+                    custom_prefix: str = None, jobs: int = 1, incremental: bool = False,
+                    index_path: Optional[Path] = None, resume: bool = False, dedup: bool = False,
+                    sort_length: bool = False, sort_buffer: int = SORT_BUFFER_SIZE) -> List[Path]:
+        """
+        Process FASTA files, streaming records straight to the output files.
+        
+        Only one record is held in memory at a time, so peak memory does not
+        depend on the number of inputs. Progress is checkpointed periodically
+        (see BatchCheckpoint); with resume, a run interrupted midway continues
+        after the last completed input instead of starting over.
+        
+        Args:
+            filepaths: List of paths to FASTA files
+            output_dir: Directory to save files
+            merge: If True, merge all files into one; if False, keep separate
+            custom_prefix: Custom prefix to use instead of filename
+            jobs: Number of worker processes
+            incremental: Reuse unchanged inputs from the previous merge (see
+                write_merged_incremental)
+            index_path: Write a source-tracking index of the merged output
+                (see SourceIndex); requires merge
+            resume: Continue from the checkpoint of an interrupted run
+            dedup: Collapse identical sequences across inputs (see
+                find_duplicates); requires merge
+            sort_length: Sort the merged output by sequence length, longest
+                first (see write_sorted); requires merge
+            sort_buffer: Bytes of records sorted in memory per run
+            
+        Returns:
+            List of output files written
+        """
+        if not merge and (index_path is not None or dedup or sort_length):
+            raise ValueError("The index, deduplication and length sorting require a merged output")
+        if incremental and (dedup or sort_length):
+            raise ValueError("An incremental merge cannot be deduplicated or sorted")
+        if resume and sort_length:
+            raise ValueError("A length-sorted merge cannot be resumed; run it again")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if sort_length:
+            return self.write_sorted(filepaths, output_dir, custom_prefix, jobs, index_path, dedup, sort_buffer)
+        if merge and incremental:
+            if self.compress is None:
+                if resume:
+                    raise ValueError("An incremental merge cannot be resumed; run it again")
+                return self.write_indexed(index_path, None, self.write_merged_incremental,
+                                          filepaths, output_dir, custom_prefix, jobs)
+            logger.warning("Incremental merge requires uncompressed output; doing a full merge")
+        
+        merged = output_dir / compressed_name(MERGED_NAME, self.compress) if merge else None
+        checkpoint = BatchCheckpoint(output_dir, self.batch_digest(filepaths, merge, custom_prefix,
+                                                                   index_path, dedup))
+        state = self.resume_state(checkpoint, merged, index_path) if resume else None
+        if state is None:
+            checkpoint.remove()
+            start = 0
         else:
-            prefix = filepath.stem.replace('.fasta', '').replace('.fa', '').replace('.fna', '')
+            start = self.restore_checkpoint(state)
+            if merge:
+                # Drop whatever was written after the last checkpoint
+                os.truncate(merged, state['output_size'])
+            # Partial files of worker processes killed with the previous run
+            for work_dir in output_dir.glob(".multifasta_*"):
+                if work_dir.is_dir():
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            logger.info(f"Resuming after {start} of {len(filepaths)} input(s)")
         
-        processed_lines = []
-        contig_num = 1
+        if dedup:
+            # The plan only depends on the inputs, so a resumed run recomputes it
+            self.find_duplicates(filepaths, custom_prefix, jobs)
+        if merge:
+            saved = self.write_indexed(index_path, state and state.get('index'), self.write_merged,
+                                       filepaths, output_dir, custom_prefix, jobs, checkpoint, start)
+        elif jobs > 1 and len(filepaths) - start > 1:
+            saved = self.write_batch_parallel(filepaths, output_dir, merge, custom_prefix, jobs,
+                                              checkpoint=checkpoint, start=start)
+        else:
+            saved = []
+            for sample_index, filepath in enumerate(filepaths[start:], start + 1):
+                output_path = output_dir / compressed_name(f"{filepath.stem}_tracked.fasta", self.compress)
+                if self.write_file(filepath, output_path, custom_prefix, sample_index):
+                    logger.info(f"Saved: {output_path}")
+                    saved.append(output_path)
+                if checkpoint.due():
+                    self.save_checkpoint(checkpoint, sample_index)
         
-        for header, sequence in sequences:
-            # Create new header with source tracking
-            new_header = self.prefix_format.format(
-                filename=prefix,
-                num=contig_num,
-                original=header
-            )
+        checkpoint.remove()
+        return saved
+    
+    def write_sorted(self, filepaths: List[Path], output_dir: Path, custom_prefix: str, jobs: int,
+                     index_path: Optional[Path], dedup: bool, sort_buffer: int) -> List[Path]:
+        """
+        Write the merged output sorted by sequence length, longest first.
+        
+        The inputs are first merged as usual (with --jobs and deduplication)
+        into an uncompressed file in a work directory, together with a
+        temporary index that carries each record's source. That file is then
+        sorted with LengthSorter, an external merge sort, and written to the
+        final (optionally compressed) output and index.
+        
+        Returns:
+            List with the merged output file
+        """
+        output_path = output_dir / compressed_name(MERGED_NAME, self.compress)
+        work_dir = Path(tempfile.mkdtemp(prefix=".multifasta_sort_", dir=output_dir))
+        compress = self.compress
+        try:
+            self.compress = None
+            try:
+                self.write_batch(filepaths, work_dir, merge=True, custom_prefix=custom_prefix, jobs=jobs,
+                                 index_path=work_dir / "unsorted.sqlite", dedup=dedup)
+            finally:
+                self.compress = compress
             
-            processed_lines.append(f">{new_header}")
+            logger.info("Sorting merged records by length")
+            sorter = LengthSorter(work_dir, sort_buffer)
+            sources = sqlite3.connect(work_dir / "unsorted.sqlite")
+            try:
+                rows = sources.execute("SELECT source, original, contig FROM contigs ORDER BY rowid")
+                with open(work_dir / MERGED_NAME, 'rb') as f:
+                    for record, row in zip(iter_fasta_records(f), rows):
+                        sorter.add(record.length, bytes(record.raw()), row)
+            finally:
+                sources.close()
             
-            # Add sequence in chunks of 80 characters (standard FASTA width)
-            for i in range(0, len(sequence), 80):
-                processed_lines.append(sequence[i:i+80])
+            tmp_path = work_dir / "sorted"
+            index = SourceIndex(index_path) if index_path is not None else None
+            try:
+                with open_output(tmp_path, self.compress, self.compress_threads) as out:
+                    for record, (source, original, contig) in sorter.sorted_records():
+                        out.write(record)
+                        if index is not None:
+                            header = record[1:record.index(b"\n")].decode()
+                            index.add(source, [(header, original, contig, 0, len(record))])
+            except BaseException:
+                if index is not None:
+                    index.discard()
+                raise
+            os.replace(tmp_path, output_path)
+            if index is not None:
+                index.close()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        logger.info(f"Saved: {output_path}")
+        return [output_path]
+    
+    def write_indexed(self, index_path: Optional[Path], index_state: Optional[dict],
+                      write, *args) -> List[Path]:
+        """Call a merge method with the source index (if any) as its last argument."""
+        index = SourceIndex(index_path, index_state) if index_path is not None else None
+        try:
+            saved = write(*args, index)
+        except BaseException:
+            if index is not None:
+                index.discard()
+            raise
+        if index is not None:
+            index.close()
+        return saved
+    
+    def write_merged(self, filepaths: List[Path], output_dir: Path, custom_prefix: str, jobs: int,
+                     checkpoint: BatchCheckpoint, start: int, index: Optional[SourceIndex]) -> List[Path]:
+        """Write the merged output, from input `start` on (see write_batch)."""
+        if jobs > 1 and len(filepaths) - start > 1:
+            return self.write_batch_parallel(filepaths, output_dir, True, custom_prefix, jobs,
+                                             index, checkpoint, start)
+        
+        output_path = output_dir / compressed_name(MERGED_NAME, self.compress)
+        records = [] if index is not None else None
+        with open_output(output_path, self.compress, self.compress_threads, append=start > 0) as out:
+            for sample_index, filepath in enumerate(filepaths[start:], start + 1):
+                self.append_file(filepath, out, custom_prefix, sample_index, records)
+                if index is not None:
+                    index.add(str(filepath), records)
+                    records.clear()
+                if checkpoint.due():
+                    self.save_checkpoint(checkpoint, sample_index, index, out, output_path)
+        logger.info(f"Saved: {output_path}")
+        return [output_path]
+    
+    def write_batch_parallel(self, filepaths: List[Path], output_dir: Path, merge: bool,
+                             custom_prefix: str, jobs: int,
+                             index: Optional[SourceIndex] = None,
+                             checkpoint: Optional[BatchCheckpoint] = None, start: int = 0) -> List[Path]:
+        """
+        Process inputs in worker processes, one file per task.
+        
+        Without merge, each worker writes its input's output file directly.
+        With merge, each worker writes a partial file (already compressed, if
+        requested) and the partials are appended to the merged output in
+        input order, so the result is identical to the serial run. Worker
+        counters (and index records) are added back to this generator.
+        Inputs before `start` were completed by an interrupted run.
+        """
+        if merge:
+            work_dir = Path(tempfile.mkdtemp(prefix=".multifasta_", dir=output_dir))
+            outputs = [work_dir / f"part{index:06d}" for index in range(len(filepaths))]
+        else:
+            work_dir = None
+            outputs = [output_dir / compressed_name(f"{filepath.stem}_tracked.fasta", self.compress)
+                       for filepath in filepaths]
+        
+        duplicates = self.duplicates or {}
+        tasks = [(self.prefix_format, self.compress, self.passthrough, self.normalize,
+                  filepath, output_path, custom_prefix, sample_index, index is not None,
+                  duplicates.get(sample_index))
+                 for sample_index, (filepath, output_path) in enumerate(zip(filepaths, outputs), 1)][start:]
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        saved = []
+        merged = output_dir / compressed_name(MERGED_NAME, self.compress)
+        out = None
+        
+        try:
+            if merge:
+                # Not opened in append mode: copy_file_range rejects O_APPEND
+                out = open(merged, "r+b" if start else "wb", buffering=0)
+                out.seek(0, os.SEEK_END)
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                # map() returns results in input order
+                for task, (count, invalid, records) in zip(
+                        tasks, executor.map(_write_file_task, tasks, chunksize=chunksize)):
+                    filepath, output_path, sample_index = task[4], task[5], task[7]
+                    self.invalid_characters.update(invalid)
+                    if count:
+                        self.processed_files += 1
+                        self.total_contigs += count
+                    if merge:
+                        if count:
+                            append_file(output_path, out)
+                            output_path.unlink()
+                            if index is not None:
+                                index.add(str(filepath), records)
+                    elif count:
+                        logger.info(f"Saved: {output_path}")
+                        saved.append(output_path)
+                    if checkpoint is not None and checkpoint.due():
+                        self.save_checkpoint(checkpoint, sample_index, index, out, merged if merge else None)
+        finally:
+            if out is not None:
+                out.close()
+            if work_dir is not None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        
+        if merge:
+            logger.info(f"Saved: {merged}")
+            return [merged]
+        return saved
+    
+    def batch_digest(self, filepaths: List[Path], merge: bool, custom_prefix: Optional[str],
+                     index_path: Optional[Path], dedup: bool = False) -> str:
+        """Digest of the settings and inputs that a checkpoint is valid for."""
+        inputs = []
+        for filepath in filepaths:
+            stat = filepath.stat()
+            inputs.append([str(filepath), stat.st_size, stat.st_mtime_ns])
+        batch = dict(self.manifest_settings(custom_prefix), merge=merge, compress=self.compress, dedup=dedup,
+                     index=str(index_path) if index_path is not None else None, inputs=inputs)
+        return hashlib.blake2b(json.dumps(batch).encode(), digest_size=16).hexdigest()
+    
+    def resume_state(self, checkpoint: BatchCheckpoint, merged: Optional[Path],
+                     index_path: Optional[Path]) -> Optional[dict]:
+        """Checkpoint state to resume from, or None to start over."""
+        state = checkpoint.load()
+        if state is None:
+            logger.info("No checkpoint for this batch; starting from the beginning")
+            return None
+        if merged is not None and (not merged.exists() or merged.stat().st_size < state['output_size']):
+            logger.warning("Merged output is shorter than at the last checkpoint; starting from the beginning")
+            return None
+        if index_path is not None and not SourceIndex.temporary_path(index_path).exists():
+            logger.warning("Partial index from the interrupted run is missing; starting from the beginning")
+            return None
+        return state
+    
+    def save_checkpoint(self, checkpoint: BatchCheckpoint, completed: int,
+                        index: Optional[SourceIndex] = None, out: Optional[BinaryIO] = None,
+                        output_path: Optional[Path] = None) -> None:
+        """Sync the merged output and the index, then save the batch progress."""
+        state = {
+            'completed': completed,
+            'processed_files': self.processed_files,
+            'total_contigs': self.total_contigs,
+            'invalid_characters': {path: dict(counts) for path, counts in self.invalid_characters.items()},
+        }
+        if out is not None:
+            state['output_size'] = sync_output(out, output_path)
+        if index is not None:
+            state['index'] = index.checkpoint()
+        checkpoint.save(state)
+    
+    def restore_checkpoint(self, state: dict) -> int:
+        """
+        Restore the counters saved by save_checkpoint.
+        
+        Returns:
+            Number of inputs already completed
+        """
+        self.processed_files = state['processed_files']
+        self.total_contigs = state['total_contigs']
+        # JSON object keys are strings; the counters are keyed by byte value
+        self.invalid_characters = {path: Counter({int(char): n for char, n in counts.items()})
+                                   for path, counts in state['invalid_characters'].items()}
+        return state['completed']
+    
+    def manifest_settings(self, custom_prefix: Optional[str]) -> dict:
+        """Settings that change the merged output; a change forces a full rebuild."""
+        return {
+            'format': self.prefix_format,
+            'custom_prefix': custom_prefix,
+            'passthrough': self.passthrough,
+            'normalize': self.normalize,
+            'line_width': LINE_WIDTH,
+        }
+    
+    def write_merged_incremental(self, filepaths: List[Path], output_dir: Path,
+                                 custom_prefix: str = None, jobs: int = 1,
+                                 index: Optional[SourceIndex] = None) -> List[Path]:
+        """
+        Merge inputs, reusing the output of unchanged inputs from the last run.
+        
+        A manifest next to the merged file records, for each input, its path,
+        size, mtime and content hash, plus the byte span of its records in the
+        merged file. On the next run, an input with the same size and mtime
+        (or, if only the mtime changed, the same hash) is copied from the old
+        merged file by block copy. Only new or changed inputs are processed
+        again, in worker processes if jobs > 1. A change of settings, or a
+        merged file modified outside this tool, rebuilds everything. With an
+        index, the manifest also keeps each input's index records, so reused
+        inputs are indexed without reading them.
+        
+        Returns:
+            List with the merged output file
+        """
+        output_path = output_dir / MERGED_NAME
+        manifest_path = output_path.with_name(output_path.name + MANIFEST_SUFFIX)
+        settings = self.manifest_settings(custom_prefix)
+        previous = load_manifest(manifest_path, output_path, settings)
+        # Headers depend on the input position only if {sample_index} is used
+        by_position = 'sample_index' in self.template.fields
+        
+        plan = []
+        for sample_index, filepath in enumerate(filepaths, 1):
+            stat = filepath.stat()
+            entry = {'path': str(filepath.resolve()), 'size': stat.st_size,
+                     'mtime_ns': stat.st_mtime_ns, 'sample_index': sample_index}
+            old = previous.get(entry['path'])
+            reuse = None
+            if (old is not None and old['size'] == entry['size']
+                    and (not by_position or old['sample_index'] == sample_index)
+                    and (index is None or 'records' in old)):
+                if old['mtime_ns'] != entry['mtime_ns']:
+                    entry['hash'] = file_digest(filepath)
+                if entry.get('hash', old['hash']) == old['hash']:
+                    reuse = old
+            plan.append((filepath, entry, reuse))
+        
+        changed = [(filepath, entry) for filepath, entry, reuse in plan if reuse is None]
+        logger.info(f"Incremental merge: {len(plan) - len(changed)} unchanged, "
+                    f"{len(changed)} new or changed input(s)")
+        
+        tmp_path = output_dir / f".{output_path.name}.tmp"
+        work_dir = None
+        executor = None
+        results = iter(())
+        source = open(output_path, 'rb') if len(changed) < len(plan) else None
+        entries = []
+        
+        try:
+            if jobs > 1 and len(changed) > 1:
+                # New inputs are formatted into partial files by the workers
+                work_dir = Path(tempfile.mkdtemp(prefix=".multifasta_", dir=output_dir))
+                tasks = [(self.prefix_format, None, self.passthrough, self.normalize,
+                          filepath, work_dir / f"part{number:06d}", custom_prefix, entry['sample_index'],
+                          index is not None, None)
+                         for number, (filepath, entry) in enumerate(changed)]
+                executor = ProcessPoolExecutor(max_workers=jobs)
+                results = zip(tasks, executor.map(_write_file_task, tasks,
+                                                  chunksize=max(1, len(tasks) // (jobs * 8))))
             
-            contig_num += 1
-            self.total_contigs += 1
+            with open_output(tmp_path) as out:
+                for filepath, entry, reuse in plan:
+                    start = out.tell()
+                    records = [] if index is not None else None
+                    if reuse is not None:
+                        copy_range(source, out, reuse['offset'], reuse['length'])
+                        count = reuse['contigs']
+                        entry['hash'] = reuse['hash']
+                        if index is not None:
+                            records = [tuple(record) for record in reuse['records']]
+                        self.processed_files += 1
+                        self.total_contigs += count
+                        logger.debug(f"Reused {filepath.name}: {count} contigs")
+                    elif executor is not None:
+                        task, (count, invalid, records) = next(results)
+                        self.invalid_characters.update(invalid)
+                        if count:
+                            append_file(task[5], out)
+                            task[5].unlink()
+                            self.processed_files += 1
+                            self.total_contigs += count
+                    else:
+                        count = self.append_file(filepath, out, custom_prefix, entry['sample_index'], records)
+                    
+                    if count:
+                        if 'hash' not in entry:
+                            entry['hash'] = file_digest(filepath)
+                        entry.update(offset=start, length=out.tell() - start, contigs=count)
+                        if index is not None:
+                            entry['records'] = records
+                            index.add(str(filepath), records)
+                        entries.append(entry)
+            
+            os.replace(tmp_path, output_path)
+        finally:
+            if source is not None:
+                source.close()
+            if executor is not None:
+                executor.shutdown()
+            if work_dir is not None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            if tmp_path.exists():
+                tmp_path.unlink()
         
-        self.processed_files += 1
-        logger.info(f"Processed {filepath.name}: {len(sequences)} contigs")
+        stat = output_path.stat()
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'settings': settings,
+            'output_size': stat.st_size,
+            'output_mtime_ns': stat.st_mtime_ns,
+            'inputs': entries,
+        }
+        tmp_manifest = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp_manifest, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_manifest, manifest_path)
         
-        return '\n'.join(processed_lines)
+        logger.info(f"Saved: {output_path}")
+        logger.info(f"Manifest: {manifest_path}")
+        return [output_path]
     
     def process_batch(self, filepaths: List[Path], merge: bool = False) -> dict:
         """
@@ -147,7 +1301,7 @@ class MultiFastaGenerator:
                     results[output_name] = processed
         
         if merge:
-            results['merged_multifasta.fasta'] = '\n'.join(merged_content)
+            results[MERGED_NAME] = '\n'.join(merged_content)
         
         return results
     
@@ -162,9 +1316,9 @@ class MultiFastaGenerator:
         output_dir.mkdir(parents=True, exist_ok=True)
         
         for filename, content in results.items():
-            output_path = output_dir / filename
-            with open(output_path, 'w') as f:
-                f.write(content)
+            output_path = output_dir / compressed_name(filename, self.compress)
+            with open_output(output_path, self.compress, self.compress_threads) as f:
+                f.write(content.encode())
             logger.info(f"Saved: {output_path}")
     
     def print_summary(self):
@@ -173,6 +1327,39 @@ class MultiFastaGenerator:
         print(f"Files processed: {self.processed_files}")
         print(f"Total contigs: {self.total_contigs}")
         print(f"Average contigs per file: {self.total_contigs/self.processed_files:.1f}")
+        if self.duplicates is not None:
+            print(f"Duplicate contigs collapsed: {self.duplicate_contigs}")
+        if self.normalize:
+            total_invalid = sum(sum(counts.values()) for counts in self.invalid_characters.values())
+            print(f"Non-IUPAC characters: {total_invalid} in {len(self.invalid_characters)} file(s)")
+            for filename, counts in sorted(self.invalid_characters.items()):
+                print(f"  {Path(filename).name}: {sum(counts.values())}")
+
+
+def _write_file_task(task: Tuple) -> Tuple[int, Dict[str, Counter], Optional[list]]:
+    """
+    Worker process: write one input to its output file.
+    
+    Returns:
+        Tuple (contig count, non-IUPAC character counts by file, index
+        records or None)
+    """
+    (prefix_format, compress, passthrough, normalize,
+     filepath, output_path, custom_prefix, sample_index, with_index, duplicates) = task
+    generator = MultiFastaGenerator(prefix_format=prefix_format, compress=compress,
+                                    passthrough=passthrough, normalize=normalize)
+    if duplicates is not None:
+        generator.duplicates = {sample_index: duplicates}
+    records = [] if with_index else None
+    count = generator.write_file(filepath, output_path, custom_prefix, sample_index, records)
+    return count, generator.invalid_characters, records
+
+
+def _sequence_digests_task(task: Tuple) -> List[Tuple[int, bytes, str]]:
+    """Worker process: hash the sequences of one input (see find_duplicates)."""
+    prefix_format, passthrough, normalize, filepath, custom_prefix, sample_index = task
+    generator = MultiFastaGenerator(prefix_format=prefix_format, passthrough=passthrough, normalize=normalize)
+    return generator.sequence_digests(filepath, custom_prefix, sample_index)
 
 
 def main():
@@ -188,12 +1375,40 @@ Examples:
   # Process multiple files and merge
   python multifasta_generator.py -i *.fasta -o output/ --merge
   
+  # Upper-case sequences and report non-IUPAC characters
+  python multifasta_generator.py -i *.fasta -o output/ --merge --normalize
+  
+  # Rewrite headers only, keeping the input line width
+  python multifasta_generator.py -i *.fasta -o output/ --merge --passthrough
+  
+  # Weekly re-merge: only new or changed assemblies are processed again
+  python multifasta_generator.py -i *.fasta -o output/ --merge --incremental
+  
+  # Index the merged output: header -> source file, original header, offset
+  python multifasta_generator.py -i *.fasta -o output/ --merge --index output/contigs.sqlite
+  
+  # Collapse plasmids shared by many samples and sort contigs by length
+  python multifasta_generator.py -i *.fasta -o output/ --merge --dedup --sort-length
+  
+  # Continue a run that was interrupted (same command plus --resume)
+  python multifasta_generator.py -i *.fasta -o output/ --merge --resume
+  
+  # Use 8 worker processes (merged output keeps the input order)
+  python multifasta_generator.py -i *.fasta -o output/ --merge --jobs 8
+  
   # Process with custom prefix
   python multifasta_generator.py -i sample.fasta -o output/ --prefix MyProject
   
+  # Compressed output (input compression is detected automatically)
+  python multifasta_generator.py -i *.fasta.gz -o output/ --merge --compress bgzf
+  
   # Custom header format
   python multifasta_generator.py -i sample.fasta -o output/ \\
     --format "{filename}|contig_{num}|{original}"
+  
+  # Computed fields: length, GC% and position of the input in the batch
+  python multifasta_generator.py -i *.fasta -o output/ --merge \\
+    --format "S{sample_index:03d}_{filename}_{num} len={length} gc={gc}"
         """
     )
     
@@ -207,7 +1422,40 @@ Examples:
                         help='Custom prefix to use instead of filename')
     parser.add_argument('--format', type=str,
                         default="{filename}_contig{num}_{original}",
-                        help='Header format string (default: {filename}_contig{num}_{original})')
+                        help='Header format string; fields: {filename}, {num}, {original}, '
+                             '{length}, {gc}, {sample_index} '
+                             '(default: {filename}_contig{num}_{original})')
+    parser.add_argument('--compress', choices=COMPRESSION_CHOICES,
+                        help='Compress output files (gz, bgzf or zst)')
+    parser.add_argument('--compress-threads', type=int, default=os.cpu_count() or 1,
+                        help='Threads used for output compression (default: number of CPUs)')
+    parser.add_argument('--passthrough', action='store_true',
+                        help='Rewrite headers only: keep the input line width when the sequence '
+                             'lines are wrapped consistently (default: rewrap at 80 columns)')
+    parser.add_argument('--normalize', action='store_true',
+                        help='Upper-case sequences, remove whitespace and report '
+                             'non-IUPAC characters per file (sequences are rewrapped at 80 columns)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='With --merge: keep a manifest and, on later runs, reprocess only '
+                             'new or changed inputs (uncompressed output only)')
+    parser.add_argument('--index', type=Path, metavar='PATH',
+                        help='With --merge: write a source-tracking index (new header, source file, '
+                             'original header, contig number, byte offset and length) as SQLite '
+                             '(.sqlite, .sqlite3, .db) or TSV (other extensions)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='With --merge: write identical sequences once, with all their sources '
+                             'listed in the header (copies=N sources=ID1,ID2,...)')
+    parser.add_argument('--sort-length', action='store_true',
+                        help='With --merge: sort the merged output by sequence length, longest first '
+                             '(external merge sort; works for merges larger than memory)')
+    parser.add_argument('--sort-buffer', type=int, default=SORT_BUFFER_SIZE // (1024 * 1024), metavar='MB',
+                        help='Memory used per sorted run with --sort-length, in MB '
+                             f'(default: {SORT_BUFFER_SIZE // (1024 * 1024)})')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted batch from its last checkpoint '
+                             '(same inputs and options; not with --incremental)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes used to process input files (default: 1)')
     parser.add_argument('-v', '--verbose', action='store_true',
                         help='Enable verbose output')
     
@@ -216,6 +1464,20 @@ Examples:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    if args.incremental and not args.merge:
+        parser.error("--incremental requires --merge")
+    if args.index and not args.merge:
+        parser.error("--index requires --merge")
+    if (args.dedup or args.sort_length) and not args.merge:
+        parser.error("--dedup and --sort-length require --merge")
+    if args.incremental and (args.dedup or args.sort_length):
+        parser.error("--incremental cannot be combined with --dedup or --sort-length")
+    if args.resume and args.sort_length:
+        parser.error("--resume cannot be combined with --sort-length")
+    if args.resume and args.incremental:
+        parser.error("--resume cannot be combined with --incremental "
+                     "(an interrupted incremental merge keeps the previous output; run it again)")
+    
     # Convert input files to Path objects
     input_files = []
     for pattern in args.input:
@@ -234,19 +1496,22 @@ Examples:
         logger.error("No input files found")
         sys.exit(1)
     
-    # Create generator and process files
-    generator = MultiFastaGenerator(prefix_format=args.format)
-    
-    if len(input_files) == 1 and not args.merge:
-        # Single file processing
-        content = generator.process_single_file(input_files[0], args.prefix)
-        if content:
-            output_name = f"{input_files[0].stem}_tracked.fasta"
-            generator.save_results({output_name: content}, Path(args.output))
-    else:
-        # Batch processing
-        results = generator.process_batch(input_files, merge=args.merge)
-        generator.save_results(results, Path(args.output))
+    # Create generator and stream records to the output files
+    try:
+        generator = MultiFastaGenerator(prefix_format=args.format, compress=args.compress,
+                                        compress_threads=args.compress_threads,
+                                        passthrough=args.passthrough,
+                                        normalize=args.normalize)
+    except ValueError as e:
+        logger.error(f"Invalid --format: {e}")
+        sys.exit(1)
+    
+    # The custom prefix applies to single-file processing only
+    custom_prefix = args.prefix if len(input_files) == 1 and not args.merge else None
+    generator.write_batch(input_files, Path(args.output), merge=args.merge,
+                          custom_prefix=custom_prefix, jobs=args.jobs, incremental=args.incremental,
+                          index_path=args.index, resume=args.resume, dedup=args.dedup,
+                          sort_length=args.sort_length, sort_buffer=args.sort_buffer * 1024 * 1024)
     
     generator.print_summary()
 
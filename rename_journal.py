@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Journal transacional de renomeações
+Motor de plano/execução compartilhado por fasta_renamer e fastq_renamer.
+
+O mapeamento completo antigo → novo é calculado antes de qualquer
+renomeação e gravado como plano (JSON). A execução ocorre em duas fases:
+todos os arquivos vão primeiro para nomes temporários e só depois para os
+nomes finais, de modo que trocas (A → B, B → A) e ciclos funcionam. Cada
+passo é acrescentado a um log ao lado do plano (<plano>.log); uma execução
+interrompida pode ser retomada com 'execute' e desfeita com 'undo'.
+
+Autor: Felipe Lei
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from file_scanner import directory_listing
+
+PLAN_VERSION = 1
+
+# Estados de cada renomeação no log: no nome original, no nome temporário
+# ou no nome novo
+AT_OLD = "O"
+AT_TMP = "T"
+AT_NEW = "N"
+
+# Subcomandos aceitos pelos renomeadores
+JOURNAL_COMMANDS = ("execute", "undo")
+
+# Execução paralela (--jobs): tamanho mínimo dos lotes de cada pasta e
+# locks por destino (o mesmo nome de destino nunca é testado e ocupado
+# por duas threads ao mesmo tempo)
+MIN_CHUNK_SIZE = 256
+DESTINATION_LOCKS = [threading.Lock() for _ in range(64)]
+
+def default_plan_path(directory: Path, tool: str) -> Path:
+    """Caminho padrão do plano: dentro da pasta, com data e hora."""
+    return directory / f"rename_plan_{tool}_{datetime.now():%Y%m%d_%H%M%S}.json"
+
+def build_plan(
+    renames: List[Tuple[Path, Path]],
+    tool: str,
+    directory: Path,
+    force: bool = False
+) -> Dict:
+    """
+    Monta o plano de renomeação.
+    
+    Renomeações para o próprio nome são descartadas. O nome temporário de
+    cada arquivo fica na mesma pasta do destino (rename atômico) e leva o
+    identificador do plano, para não colidir com outros arquivos. Com
+    force, destinos que já existem (e não fazem parte do plano) são
+    sobrescritos.
+    """
+    plan_id = secrets.token_hex(4)
+    entries = []
+    for old_path, new_path in renames:
+        if old_path == new_path:
+            continue
+        tmp_path = new_path.parent / f".{new_path.name}.{plan_id}-{len(entries)}.renomeando"
+        entries.append({"old": str(old_path), "new": str(new_path), "tmp": str(tmp_path)})
+    
+    return {
+        "version": PLAN_VERSION,
+        "id": plan_id,
+        "tool": tool,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "directory": str(directory),
+        "force": force,
+        "renames": entries,
+    }
+
+def save_plan(plan: Dict, plan_path: Path) -> None:
+    """Grava o plano de forma atômica e inicia um log vazio."""
+    tmp_path = plan_path.with_name(plan_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=1, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, plan_path)
+    log_path(plan_path).unlink(missing_ok=True)
+    logging.info(f"Plano de renomeação salvo em: {plan_path} ({len(plan['renames'])} arquivos)")
+
+def load_plan(plan_path: Path) -> Dict:
+    """Lê um plano gravado por save_plan."""
+    with open(plan_path, encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"Versão de plano não suportada: {plan.get('version')}")
+    return plan
+
+def log_path(plan_path: Path) -> Path:
+    """Log de progresso de um plano."""
+    return plan_path.with_name(plan_path.name + ".log")
+
+def load_states(plan: Dict, plan_path: Path) -> List[str]:
+    """Estado atual de cada renomeação, segundo o log (última linha vale)."""
+    states = [AT_OLD] * len(plan["renames"])
+    path = log_path(plan_path)
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                # Linha incompleta no fim do log (interrupção durante a escrita)
+                if len(parts) != 2 or parts[0] not in (AT_OLD, AT_TMP, AT_NEW) or not parts[1].isdigit():
+                    continue
+                states[int(parts[1])] = parts[0]
+    return states
+
+class JournalWriter:
+    """Acrescenta transições de estado ao log de um plano (thread-safe)."""
+    
+    def __init__(self, plan_path: Path):
+        self.handle = open(log_path(plan_path), "a", encoding="utf-8")
+        self.lock = threading.Lock()
+    
+    def record(self, state: str, index: int) -> None:
+        # flush a cada passo: o log sobrevive ao fim abrupto do processo
+        with self.lock:
+            self.handle.write(f"{state} {index}\n")
+            self.handle.flush()
+    
+    def sync(self) -> None:
+        """Grava o log em disco (fim de cada fase)."""
+        os.fsync(self.handle.fileno())
+    
+    def close(self) -> None:
+        self.sync()
+        self.handle.close()
+
+def _move(
+    source: str,
+    destination: str,
+    journal: JournalWriter,
+    state: str,
+    index: int,
+    occupied: Set[Path],
+    overwrite: bool = True
+) -> bool:
+    """
+    Renomeia um arquivo e registra o novo estado.
+    
+    `occupied` é o conjunto em memória dos caminhos existentes, mantido
+    atualizado a cada renomeação: o destino não é consultado no disco.
+    """
+    with DESTINATION_LOCKS[hash(destination) % len(DESTINATION_LOCKS)]:
+        if not overwrite and Path(destination) in occupied:
+            logging.error(f"Arquivo de destino já existe: {destination}")
+            return False
+        try:
+            os.rename(source, destination)
+        except OSError as e:
+            logging.error(f"Erro ao renomear {Path(source).name}: {e}")
+            return False
+        occupied.discard(Path(source))
+        occupied.add(Path(destination))
+    journal.record(state, index)
+    return True
+
+def _run_phase(
+    indices: List[int],
+    entries: List[Dict],
+    step: Callable[[int], bool],
+    jobs: int = 1
+) -> int:
+    """
+    Aplica `step` a cada renomeação de uma fase.
+    
+    Com jobs > 1, as renomeações são agrupadas por pasta de destino e cada
+    pasta é dividida em lotes executados por um pool de threads (em NFS e
+    Lustre cada rename espera a resposta do servidor). A ordem dentro de um
+    lote é preservada.
+    
+    Returns:
+        Número de renomeações que falharam
+    """
+    if jobs <= 1 or len(indices) <= 1:
+        return sum(1 for index in indices if not step(index))
+    
+    groups: Dict[Path, List[int]] = {}
+    for index in indices:
+        groups.setdefault(Path(entries[index]["new"]).parent, []).append(index)
+    chunks = []
+    for group in groups.values():
+        size = max(MIN_CHUNK_SIZE, -(-len(group) // (jobs * 4)))
+        chunks.extend(group[start:start + size] for start in range(0, len(group), size))
+    
+    erros = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(lambda chunk: [step(index) for index in chunk], chunk): len(chunk)
+                   for chunk in chunks}
+        for future in as_completed(futures):
+            erros += future.result().count(False)
+            done += futures[future]
+            if len(chunks) > 1:
+                logging.info(f"Progresso: {done}/{len(indices)} arquivos")
+    return erros
+
+def execute_plan(
+    plan: Dict,
+    plan_path: Path,
+    listing: Optional[Set[Path]] = None,
+    jobs: int = 1
+) -> Tuple[int, int]:
+    """
+    Executa (ou retoma) um plano em duas fases.
+    
+    Fase 1: original → temporário, para todos os arquivos. Fase 2:
+    temporário → novo nome. Arquivos que já estão no nome novo são
+    ignorados, então o mesmo plano pode ser executado de novo após uma
+    interrupção. Um arquivo que não pôde ir para o nome temporário
+    permanece no nome original e conta como erro; sem force, um arquivo
+    cujo destino está ocupado volta ao nome original.
+    
+    Args:
+        listing: Entradas já conhecidas das pastas de destino (da varredura
+            do renomeador); se omitido, cada pasta é listada uma vez aqui
+        jobs: Threads para as renomeações de cada fase
+    
+    Returns:
+        Tupla (sucessos, erros)
+    """
+    entries = plan["renames"]
+    force = plan.get("force", False)
+    if listing is None:
+        listing = directory_listing(Path(entry["new"]).parent for entry in entries)
+    states = load_states(plan, plan_path)
+    journal = JournalWriter(plan_path)
+    
+    def to_tmp(index: int) -> bool:
+        entry = entries[index]
+        if not _move(entry["old"], entry["tmp"], journal, AT_TMP, index, listing):
+            return False
+        states[index] = AT_TMP
+        return True
+    
+    def to_new(index: int) -> bool:
+        entry = entries[index]
+        if _move(entry["tmp"], entry["new"], journal, AT_NEW, index, listing, overwrite=force):
+            states[index] = AT_NEW
+            logging.info(f"Renomeado: {Path(entry['old']).name} → {Path(entry['new']).name}")
+            return True
+        if _move(entry["tmp"], entry["old"], journal, AT_OLD, index, listing, overwrite=False):
+            states[index] = AT_OLD
+        return False
+    
+    try:
+        erros = _run_phase([index for index, state in enumerate(states) if state == AT_OLD],
+                           entries, to_tmp, jobs)
+        journal.sync()
+        erros += _run_phase([index for index, state in enumerate(states) if state == AT_TMP],
+                            entries, to_new, jobs)
+    finally:
+        journal.close()
+    
+    sucessos = states.count(AT_NEW)
+    logging.info(f"Journal: {plan_path} (desfazer com: undo {plan_path})")
+    return sucessos, erros
+
+def undo_plan(plan: Dict, plan_path: Path, jobs: int = 1) -> Tuple[int, int]:
+    """
+    Desfaz um plano executado (total ou parcialmente), do fim para o início.
+    
+    Também em duas fases: novo nome → temporário, depois temporário →
+    nome original. Com jobs > 1, cada fase usa um pool de threads.
+    
+    Returns:
+        Tupla (restaurados, erros)
+    """
+    entries = plan["renames"]
+    occupied = directory_listing(Path(entry["old"]).parent for entry in entries)
+    states = load_states(plan, plan_path)
+    journal = JournalWriter(plan_path)
+    
+    def to_tmp(index: int) -> bool:
+        entry = entries[index]
+        if not _move(entry["new"], entry["tmp"], journal, AT_TMP, index, occupied):
+            return False
+        states[index] = AT_TMP
+        return True
+    
+    def to_old(index: int) -> bool:
+        entry = entries[index]
+        if not _move(entry["tmp"], entry["old"], journal, AT_OLD, index, occupied, overwrite=False):
+            logging.error(f"Arquivo mantido no nome temporário: {entry['tmp']}")
+            return False
+        states[index] = AT_OLD
+        logging.info(f"Restaurado: {Path(entry['new']).name} → {Path(entry['old']).name}")
+        return True
+    
+    try:
+        erros = _run_phase([index for index in reversed(range(len(entries))) if states[index] == AT_NEW],
+                           entries, to_tmp, jobs)
+        journal.sync()
+        pending = [index for index in reversed(range(len(entries))) if states[index] == AT_TMP]
+        failed = _run_phase(pending, entries, to_old, jobs)
+    finally:
+        journal.close()
+    
+    return len(pending) - failed, erros + failed
+
+def apply_renames(
+    renames: List[Tuple[Path, Path]],
+    tool: str,
+    directory: Path,
+    dry_run: bool = False,
+    plan_path: Optional[Path] = None,
+    force: bool = False,
+    listing: Optional[Set[Path]] = None,
+    jobs: int = 1
+) -> Tuple[int, int]:
+    """
+    Grava o plano das renomeações já validadas e o executa.
+    
+    Em dry run o plano é apenas gravado (e listado), para ser executado
+    depois com o subcomando 'execute', sem varrer a pasta de novo.
+    `listing` são as entradas das pastas já obtidas na varredura; `jobs`
+    é o número de threads da execução.
+    
+    Returns:
+        Tupla (sucessos, erros)
+    """
+    plan = build_plan(renames, tool, directory, force)
+    if plan_path is None:
+        plan_path = default_plan_path(directory, tool)
+    save_plan(plan, plan_path)
+    
+    if dry_run:
+        for entry in plan["renames"]:
+            logging.info(f"[DRY RUN] {Path(entry['old']).name} → {Path(entry['new']).name}")
+        logging.info(f"Para executar: {Path(sys.argv[0]).name} execute {plan_path}")
+        return len(plan["renames"]), 0
+    
+    return execute_plan(plan, plan_path, listing, jobs)
+
+def main_journal(command: str, argv: List[str]) -> Tuple[int, int]:
+    """Subcomandos 'execute' e 'undo' de um plano gravado."""
+    descriptions = {
+        "execute": "Executa (ou retoma) um plano de renomeação gravado com --dry-run",
+        "undo": "Desfaz as renomeações registradas em um plano, do fim para o início",
+    }
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} {command}",
+        description=descriptions[command]
+    )
+    parser.add_argument(
+        "plano",
+        help="Arquivo do plano (rename_plan_*.json)"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Renomeações em paralelo, por pasta (padrão: 1)"
+    )
+    parser.add_argument(
+        "--verbose", "-v",
+        action="store_true",
+        help="Saída detalhada"
+    )
+    
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs deve ser pelo menos 1")
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    
+    plan_path = Path(args.plano)
+    try:
+        plan = load_plan(plan_path)
+    except (OSError, ValueError) as e:
+        logging.error(f"Erro ao ler o plano: {e}")
+        return 0, 1
+    
+    if command == "execute":
+        return execute_plan(plan, plan_path, jobs=args.jobs)
+    return undo_plan(plan, plan_path, args.jobs)